@@ -14,7 +14,7 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath('../../'))
 
-autodoc_mock_imports = ["tqdm", "rdflib", "requests", "networkx", "oc_ocdm", "python_Levenshtein", "requests_cache"]
+autodoc_mock_imports = ["tqdm", "rdflib", "requests", "oc_ocdm", "rapidfuzz", "requests_cache"]
 
 
 # -- Project information -----------------------------------------------------
@@ -13,45 +13,309 @@ OF THIS SOFTWARE.
 
 __author__ = 'Gabriele Pisciotta'
 
-import json
+import logging
 import os
+import random
 import re
-import sys
-import time
+import shelve
+import threading
 import unicodedata
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache, wraps
 from time import sleep
 from urllib.parse import quote
 
-import Levenshtein
-import requests
+import orjson
 import requests_cache
 from oc_ocdm.graph.graph_entity import GraphEntity
-from requests.exceptions import ReadTimeout, ConnectTimeout
+from rapidfuzz import fuzz, process
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ReadTimeout, ConnectTimeout, RequestException
+
+log = logging.getLogger(__name__)
+
+# HTTP status codes that signal a temporary condition on the server side: the same request may succeed later
+_TRANSIENT_STATUS_CODES = (429, 502, 503, 504)
+
+# Characters removed from the authors' names (digits are already included in \w)
+_NAME_CLEAN_RE = re.compile(r"[^\w\s]")
+
+# The stoplist used to clean the titles before querying Crossref, loaded only once for all the instances
+with open(os.path.join(os.path.dirname(__file__), "stopwords-it.txt"), 'rt', encoding='utf-8') as f:
+    _STOPLIST = frozenset(line.strip() for line in f)
+
+
+@lru_cache(maxsize=10_000)
+def _ascii_fold(text: str) -> str:
+    """ Remove the diacritics from a string, dropping any other non-ASCII character
+
+    :param text: the string to fold
+    :return: the ASCII version of the string
+    """
+    return unicodedata.normalize('NFKD', text).encode("ASCII", "ignore").decode("utf-8")
+
+
+@lru_cache(maxsize=50_000)
+def _norm_author(given_name: str, family_name: str) -> tuple:
+    """ Normalise the name of an author as it is matched against the ones returned by Crossref
+
+    :param given_name: the given name of the author, or None
+    :param family_name: the family name of the author, or None
+    :return: a tuple <given_name, family_name> in lower case, where a missing name is an empty string
+    """
+    name = given_name.lower() if given_name is not None else ""
+    surname = family_name.lower() if family_name is not None else ""
+    return name, surname
+
+
+def build_session(cache_name: str = 'GraphEnricher_cache',
+                  backend: str = 'sqlite',
+                  expire_after: timedelta = timedelta(days=30),
+                  pool_connections: int = 16,
+                  pool_maxsize: int = 64) -> requests_cache.CachedSession:
+    """ Create a cached HTTP session to be given to the API clients. Reusing the same session lets every request go
+    through an already open TCP/TLS connection and through a single cache. Also 404 responses are cached, so that
+    an identifier not found is not looked up again.
+
+    :param cache_name: the name of the cache (for the sqlite backend, the name of the database file)
+    :param backend: the requests_cache backend used to store the responses
+    :param expire_after: how long a cached response is considered valid
+    :param pool_connections: the number of hosts whose connections are kept open
+    :param pool_maxsize: the maximum number of connections kept open for each host
+    :return: the cached session
+    """
+    session = requests_cache.CachedSession(cache_name, backend=backend, expire_after=expire_after,
+                                           allowable_codes=(200, 404))
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ResultCache:
+    """
+    A persistent cache of the results returned by the API clients, already parsed, that survives between different
+    runs. It sits on top of the HTTP cache of the session: a result found here needs neither a request nor the
+    parsing of a response. The results are stored by means of `shelve`, in a file that can't be shared by more
+    processes at the same time, while the threads of a process can use it concurrently.
+    """
+    def __init__(self, filename: str = 'GraphEnricher_results'):
+        """
+
+        :param filename: the name of the file where the results are stored
+        """
+        self._shelf = shelve.open(filename)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, key: str) -> tuple:
+        """
+        Retrieve a result from the cache
+
+        :param key: the key of the result
+        :return: a tuple <found, result>, where found is False if the key is not in the cache
+        """
+        with self._lock:
+            if key in self._shelf:
+                return True, self._shelf[key]
+        return False, None
+
+    def set(self, key: str, value) -> None:
+        """
+        Store a result in the cache
+
+        :param key: the key of the result
+        :param value: the result, which must be picklable
+        """
+        with self._lock:
+            self._shelf[key] = value
+
+    def close(self) -> None:
+        """
+        Write the cache to its file and close it
+        """
+        with self._lock:
+            self._shelf.close()
 
 
 class QueryInterface(ABC):
     """
     This class is a sort of interface that you can implement in your own class
     """
-    def __init__(self):
-        requests_cache.install_cache('GraphEnricher_cache')
+    max_iteration = 6
+    sec_to_wait = 5
+    max_sec_to_wait = 60
+    cache_expire_after = timedelta(days=30)
+    # The maximum number of requests that an API client keeps in flight, however many threads are using it
+    max_concurrent_requests = 16
+
+    # HTTP session shared by all the API clients, created the first time one of them is instantiated
+    _SESSION = None
+    _SESSION_LOCK = threading.Lock()
+
+    def __init__(self, session: requests_cache.CachedSession = None, result_cache: ResultCache = None):
+        """
+
+        :param session: the HTTP session used to send the requests. If not specified, a session shared by all the
+        API clients is used
+        :param result_cache: the persistent cache where the results of the memoized methods are kept between
+        different runs. If not specified, the results are kept in memory only
+        """
+        self.session = session if session is not None else QueryInterface._shared_session()
+        self.result_cache = result_cache
+        self._memoized = []
+        self._request_slots = threading.BoundedSemaphore(self.max_concurrent_requests)
+        # Results of the batch lookups, by the arguments of the single lookup they answer
+        self._prefetched = {}
+
+    @classmethod
+    def _shared_session(cls) -> requests_cache.CachedSession:
+        """
+        Return the HTTP session shared by all the API clients that haven't been given one, creating it the first time
+
+        :return: the shared cached session
+        """
+        with QueryInterface._SESSION_LOCK:
+            if QueryInterface._SESSION is None:
+                QueryInterface._SESSION = build_session(expire_after=cls.cache_expire_after)
+            return QueryInterface._SESSION
 
     @abstractmethod
     def query(self, entity):
         raise NotImplementedError
 
+    def query_many(self, arguments: list, max_workers: int = 16) -> list:
+        """
+        Run `query` once for each tuple of positional arguments given in input, keeping up to `max_workers`
+        requests in flight at the same time. Since every query is dominated by the network round-trip, this lets
+        you resolve a batch of entities in roughly the time of the slowest request.
+
+        :param arguments: a list of tuples, each one containing the positional arguments of a `query` call
+        :param max_workers: the maximum number of concurrent requests
+        :return: a list containing the result of each query, in the same order of the arguments given in input
+        """
+        if len(arguments) <= 1 or max_workers <= 1:
+            return [self.query(*args) for args in arguments]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(arguments))) as executor:
+            return list(executor.map(lambda args: self.query(*args), arguments))
+
+    def clear_cache(self) -> None:
+        """
+        Empty the in-memory cache of the results returned by the memoized methods and by the batch lookups of
+        this instance
+        """
+        for method in self._memoized:
+            method.cache_clear()
+        self._prefetched.clear()
+
+    def _memoize(self, *method_names: str, maxsize: int = 100_000, persist: bool = True) -> None:
+        """
+        Replace the given methods of this instance with a memoized version of themselves, so that a request already
+        done (and its JSON parsing) is not repeated. Negative results are cached as well, to avoid querying the APIs
+        again for something that has not been found. If a persistent cache has been given, the results are also
+        looked up and stored there, unless `persist` is False.
+
+        :param method_names: the names of the methods to memoize, whose arguments must be hashable
+        :param maxsize: the maximum number of results kept for each method
+        :param persist: a bool flag to keep the results in the persistent cache too, if any
+        """
+        for method_name in method_names:
+            method = getattr(self, method_name)
+            if persist and self.result_cache is not None:
+                method = self._persist(method_name, method)
+            method = lru_cache(maxsize=maxsize)(method)
+            setattr(self, method_name, method)
+            self._memoized.append(method)
+
+    def _persist(self, method_name: str, method):
+        """
+        Wrap a method so that its results are looked up in the persistent cache before calling it, and stored there
+        afterwards. A None result is not stored, since it may be due to a request that failed.
+
+        :param method_name: the name of the method
+        :param method: the method to wrap, whose arguments must have a stable representation
+        :return: the wrapped method
+        """
+        cache = self.result_cache
+        prefix = "{}.{}:".format(type(self).__name__, method_name)
+
+        @wraps(method)
+        def persisted(*args, **kwargs):
+            key = prefix + repr(args) + (repr(sorted(kwargs.items())) if kwargs else "")
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = method(*args, **kwargs)
+            if value is not None:
+                cache.set(key, value)
+            return value
+
+        return persisted
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        """
+        Compute how many seconds to wait before the next attempt. If the server specified a `Retry-After` header
+        it is honoured, otherwise the delay grows exponentially with the number of attempts, plus a random jitter.
+
+        :param attempt: the number of the attempt that has just failed, starting from 0
+        :param retry_after: the value of the `Retry-After` header, if any
+        :return: the number of seconds to wait
+        """
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                # Retry-After can also be an HTTP date: fall back to the exponential backoff
+                pass
+        return min(self.sec_to_wait * 2 ** attempt, self.max_sec_to_wait) + random.uniform(0, 1)
+
+    def _get(self, url: str, params: dict = None, timeout: float = 60):
+        """
+        Send a GET request, retrying up to `max_iteration` times when the connection times out or the server
+        answers with a transient error (e.g. 429 or 503). At most `max_concurrent_requests` requests are sent at the
+        same time by each API client: the other threads wait for their turn, but not while backing off.
+
+        :param url: the URL to query
+        :param params: the optional query string parameters
+        :param timeout: the timeout of each attempt, in seconds
+        :return: the response, or None if all the attempts failed
+        """
+        for attempt in range(self.max_iteration):
+            retry_after = None
+            try:
+                with self._request_slots:
+                    response = self.session.get(url, headers=self.headers, params=params, timeout=timeout)
+            except (ConnectTimeout, ReadTimeout) as ex:
+                print("[GraphEnricher-{}]:".format(type(self).__name__) + repr(ex) + "__" + url)
+            else:
+                if response.status_code not in _TRANSIENT_STATUS_CODES:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_iteration - 1:
+                sleep(self._backoff(attempt, retry_after))
+        return None
+
 
 class VIAF(QueryInterface):
     """
     This class let you extract the VIAF of an author, by querying the viaf.org API
     """
-    def __init__(self):
-        super().__init__()
+    def __init__(self, session: requests_cache.CachedSession = None, result_cache: ResultCache = None):
+        super().__init__(session, result_cache)
         self.headers = {
             "User-Agent": "GraphEnricher (via OpenCitations - http://opencitations.net;  mailto:contact@opencitations.net)",
             "Accept": "application/json"}
         self.api_url = 'http://www.viaf.org/viaf/search?local.title+all+"{}"&query=local.names+all+"{}"&sortKeys=holdingscount&recordSchema=BriefVIAF'
+        self._memoize('query')
 
     def query(self, given_name: str, family_name: str, title: str):
         """
@@ -65,10 +329,12 @@ class VIAF(QueryInterface):
         try:
             name = f"{given_name} {family_name}".strip()
             query = self.api_url.format(quote(title), quote(name))
-            r_cr = requests.get(query, headers=self.headers, timeout=60)
+            r_cr = self._get(query)
+            if r_cr is None:
+                return None
             hdrs_cr = r_cr.headers
             try:
-                r = r_cr.json()
+                r = orjson.loads(r_cr.content)
                 if int(r['searchRetrieveResponse']['numberOfRecords']) != 1:
                     return None
                 else:
@@ -76,23 +342,13 @@ class VIAF(QueryInterface):
 
             except Exception as ex1:
                 if hdrs_cr["content-type"] == 'text/plain' or hdrs_cr["content-type"] == 'text/html':
-                    r = r_cr.text
-                    if "503" in r:
-                        time.sleep(5.0)
-                        solution = self.query(given_name, family_name, title)
-                        return solution
-                    else:
-                        print("[GraphEnricher-VIAF]:" + repr(ex1) + "__" + query + "__" + r)
+                    print("[GraphEnricher-VIAF]:" + repr(ex1) + "__" + query + "__" + r_cr.text)
                 else:
                     print(
                         "[GraphEnricher-VIAF]:" + repr(ex1) + "__" + query + "__" + hdrs_cr["content-type"])
 
-        except Exception as ex0:
-            if "ConnectTimeout" in repr(ex0):
-                print("[GraphEnricher-Crossref]:" + repr(ex0) + "__" + query)
-                time.sleep(5.0)
-                solution = self.query(given_name, family_name, title)
-                return solution
+        except Exception:
+            return None
 
 
 class WikiData(QueryInterface):
@@ -100,8 +356,8 @@ class WikiData(QueryInterface):
     This class let you query WikiData by means of another identifier, in order to check the existance of a related
     entity on WikiData
     """
-    def __init__(self):
-        super().__init__()
+    def __init__(self, session: requests_cache.CachedSession = None, result_cache: ResultCache = None):
+        super().__init__(session, result_cache)
         self.headers = {
             "User-Agent": "GraphEnricher (via OpenCitations - http://opencitations.net;  mailto:contact@opencitations.net)",
             "Accept": "application/json"}
@@ -118,6 +374,23 @@ class WikiData(QueryInterface):
         self.viaf_property = "P214"
         self.pmid_property = "P698"
         self.pmcid_property = "P932"
+        self._schema_to_property = {
+            "doi": self.doi_property,
+            "issn": self.issn_property,
+            "orcid": self.orcid_property,
+            "viaf": self.viaf_property,
+            "pmid": self.pmid_property,
+            "pmcid": self.pmcid_property}
+        # Schemas whose literal is stored upper-case on WikiData
+        self._schema_upper = {"doi"}
+        self.batch_query = '''
+        SELECT ?item ?literal WHERE {{
+              VALUES ?literal {{ {literals} }}
+              ?item p:{property} ?x.
+              ?x ps:{property} ?literal.
+        }}
+        '''
+        self._memoize('query')
 
     def query(self, entity: str, schema: str):
         """
@@ -127,44 +400,82 @@ class WikiData(QueryInterface):
         :param schema: the schema of the given identifier
         :return: Wikidata ID if found, otherwise None
         """
-        if schema == 'doi':
-            query = self.base_query.format(property=self.doi_property, literal=entity.upper())
-        elif schema == 'issn':
-            query = self.base_query.format(property=self.issn_property, literal=entity)
-        elif schema == 'orcid':
-            query = self.base_query.format(property=self.orcid_property, literal=entity)
-        elif schema == 'viaf':
-            query = self.base_query.format(property=self.viaf_property, literal=entity)
-        elif schema == 'pmid':
-            query = self.base_query.format(property=self.pmid_property, literal=entity)
-        elif schema == 'pmcid':
-            query = self.base_query.format(property=self.pmcid_property, literal=entity)
-
-        r = requests.get(self.api_url, headers=self.headers, timeout=60, params={'format': 'json', 'query': query})
+        prop = self._schema_to_property.get(schema)
+        if prop is None:
+            return None
+        if (schema, entity) in self._prefetched:
+            return self._prefetched[(schema, entity)]
+        literal = entity.upper() if schema in self._schema_upper else entity
+        query = self.base_query.format(property=prop, literal=literal)
+
+        r = self._get(self.api_url, params={'format': 'json', 'query': query})
+        if r is None:
+            return None
         headers = r.headers
 
         try:
-            data = r.json()
+            data = orjson.loads(r.content)
             return data['results']['bindings'][0]['item']['value'].split("/")[-1]
         except IndexError:
             return None
         except Exception as ex1:
 
             if headers["content-type"] == 'text/plain' or headers["content-type"] == 'text/html':
-                r = r.text
-
-                if "503" in r:
-                    time.sleep(5.0)
-                    solution = self.query(entity, schema)
-                    return solution
-                else:
-                    # ex1.with_traceback()
-                    print("[GraphEnricher-WikiData]:" + repr(ex1) + "__" + query + "__" + r)
+                # ex1.with_traceback()
+                print("[GraphEnricher-WikiData]:" + repr(ex1) + "__" + query + "__" + r.text)
             else:
                 # ex1.with_traceback()
                 print("[GraphEnricher-WikiData]:" + repr(ex1) + "__" + query + "__" + headers["content-type"])
 
 
+    def query_batch(self, literals: list, schema: str, chunk_size: int = 100) -> dict:
+        """
+        Method to query WikiData for many identifiers sharing the same schema at once, by means of a VALUES clause.
+        The literals are split in chunks of `chunk_size` elements, to keep each request URL short enough. The results
+        are also kept, so that a later `query` for one of these literals doesn't send any request.
+
+        :param literals: the literals of the identifiers
+        :param schema: the schema of the identifiers
+        :param chunk_size: the maximum number of literals sent in a single query
+        :return: a dictionary mapping each literal found to its Wikidata ID
+        """
+        prop = self._schema_to_property.get(schema)
+        if prop is None:
+            return {}
+        upper = schema in self._schema_upper
+
+        to_return = {}
+        literals = [literal for literal in dict.fromkeys(literals) if literal is not None]
+        for start in range(0, len(literals), chunk_size):
+            chunk = literals[start:start + chunk_size]
+            # The literal sent to WikiData may differ from the one given (e.g. DOIs are upper-cased)
+            originals = {}
+            for literal in chunk:
+                originals.setdefault(literal.upper() if upper else literal, []).append(literal)
+            values = " ".join('"%s"' % lit.replace("\\", "\\\\").replace('"', '\\"') for lit in originals)
+            query = self.batch_query.format(property=prop, literals=values)
+
+            r = self._get(self.api_url, params={'format': 'json', 'query': query})
+            if r is None:
+                continue
+            try:
+                data = orjson.loads(r.content)
+                found = {}
+                for binding in data['results']['bindings']:
+                    found.setdefault(binding['literal']['value'], binding['item']['value'].split("/")[-1])
+            except Exception as ex1:
+                print("[GraphEnricher-WikiData]:" + repr(ex1) + "__" + query + "__" + r.headers.get("content-type", ""))
+                continue
+
+            for sent, chunk_literals in originals.items():
+                for literal in chunk_literals:
+                    self._prefetched[(schema, literal)] = found.get(sent)
+                    if sent in found:
+                        to_return[literal] = found[sent]
+
+        return to_return
+
+
 class Crossref(QueryInterface):
     """
     This class let you query Crossref in order to extract DOIs, ISSNs and publishers' IDs
@@ -176,9 +487,11 @@ class Crossref(QueryInterface):
                  headers={"User-Agent": "GraphEnricher (via OpenCitations - http://opencitations.net; "
                                         "mailto:contact@opencitations.net)"},
                  timeout=30,
-                 is_json=True):
+                 is_json=True,
+                 session: requests_cache.CachedSession = None,
+                 result_cache: ResultCache = None):
 
-        super().__init__()
+        super().__init__(session, result_cache)
 
         self.max_iteration = max_iteration
         self.sec_to_wait = sec_to_wait
@@ -189,9 +502,8 @@ class Crossref(QueryInterface):
         self.__crossref_doi_url = 'https://api.crossref.org/works/'
         self.__crossref_entry_url = 'https://api.crossref.org/works?query.bibliographic='
         self.__crossref_journal_url = 'https://api.crossref.org/journals/'
-        with open(os.path.join(str(__file__).replace("__init__.py", ""), "stopwords-it.txt"),
-                  'rt', encoding='utf-8') as f:
-            self.stoplist = set([line.strip() for line in f])
+        self.stoplist = _STOPLIST
+        self._memoize('query_journal', 'query_publisher')
 
     def _cleaning_title(self, title: str):
 
@@ -213,10 +525,9 @@ class Crossref(QueryInterface):
         :param name_raw: the name string
         :return: the cleaned name
         """
-        name_clean = u"".join([c for c in unicodedata.normalize("NFKD", name_raw) if not unicodedata.combining(c)])
-        name_clean = name_clean.lower()
-        name_clean = re.sub(r"[^\w\d\s]", "", name_clean)
-        return name_clean
+        combining = unicodedata.combining
+        name_clean = "".join([c for c in unicodedata.normalize("NFKD", name_raw) if not combining(c)])
+        return _NAME_CLEAN_RE.sub("", name_clean.lower())
 
     def query_journal(self, issn: str):
         """ Query Crossref to get a list of any other ISSN known, related to an entity described by an ISSN to give
@@ -227,11 +538,13 @@ class Crossref(QueryInterface):
         """
         query = self.__crossref_journal_url + issn
         try:
-            r_cr = requests.get(query, headers=self.headers, timeout=60)
+            r_cr = self._get(query)
+            if r_cr is None:
+                return None
             hdrs_cr = r_cr.headers
 
             try:
-                r = r_cr.json()
+                r = orjson.loads(r_cr.content)
                 if r["message"]["ISSN"]:
                     new_issn = r["message"]["ISSN"]
                     if issn in new_issn:
@@ -243,10 +556,6 @@ class Crossref(QueryInterface):
                     r = r_cr.text
                     if "Resource not found" in r:
                         return None
-                    if "503" in r:
-                        time.sleep(5.0)
-                        solution = self.query_journal(issn)
-                        return solution
                     else:
                         # ex1.with_traceback()
                         print("[GraphEnricher-Crossref]:" + repr(ex1) + "__" + query + "__" + r)
@@ -254,13 +563,9 @@ class Crossref(QueryInterface):
                     # ex1.with_traceback()
                     print("[GraphEnricher-Crossref]:" + repr(ex1) + "__" + query + "__" + hdrs_cr["content-type"])
 
-        except Exception as ex0:
+        except Exception:
             # ex0.with_traceback()
-            if "ConnectTimeout" in repr(ex0):
-                print("[GraphEnricher-Crossref]:" + repr(ex0) + "__" + query)
-                time.sleep(5.0)
-                solution = self.query_journal(issn)
-                return solution
+            return None
 
     def query_publisher(self, doi:str):
         """ Method to extract the identifier of a publisher starting from a given DOI.
@@ -270,35 +575,27 @@ class Crossref(QueryInterface):
         """
         url_cr = self.__crossref_doi_url + doi
         try:
-            r_cr = requests.get(url_cr, headers=self.headers, timeout=60)
+            r_cr = self._get(url_cr)
+            if r_cr is None:
+                return None
             hdrs_cr = r_cr.headers
 
             try:
-                r = r_cr.json()
+                r = orjson.loads(r_cr.content)
                 if "message" in r and "member" in r["message"]:
                     return r["message"]["member"]
 
             except Exception as ex1:
                 # ex1.with_traceback()
                 if hdrs_cr["content-type"] == 'text/plain' or hdrs_cr["content-type"] == 'text/html':
-                    r = r_cr.text
-                    if "503" in r:
-                        time.sleep(5.0)
-                        solution = self.query_publisher(doi)
-                        return solution
-                    else:
-                        print("[GraphEnricher-Crossref-publisher]:" + repr(ex1) + "__" + url_cr + "__" + r)
+                    print("[GraphEnricher-Crossref-publisher]:" + repr(ex1) + "__" + url_cr + "__" + r_cr.text)
                 else:
                     print("[GraphEnricher-Crossref-publisher]:" + repr(ex1) + "__" + url_cr + "__" + hdrs_cr[
                         "content-type"])
 
-        except Exception as ex0:
+        except Exception:
             # ex0.with_traceback()
-            if "ConnectTimeout" in repr(ex0):
-                print("[GraphEnricher-Crossref-publisher]:" + repr(ex0) + "__" + url_cr)
-                time.sleep(5.0)
-                solution = self.query_publisher(doi)
-                return solution
+            return None
 
     def query(self, fullnames: list, title: str, year: str):
         """
@@ -309,6 +606,10 @@ class Crossref(QueryInterface):
         :param year: a string that represent the year of publication
         :return: the DOI found, otherwise None
         """
+        key = self._batch_key(fullnames, title, year)
+        if key in self._prefetched:
+            return self._prefetched[key]
+
         keywords = self._cleaning_title(title)
         query = f"query.bibliographic={keywords}"
         exist_author = False
@@ -318,14 +619,8 @@ class Crossref(QueryInterface):
                     surname = self._cleaning_name(fullname[0].split(" ")[-1])
                     name = self._cleaning_name(fullname[1].split(" ")[0])
                 else:
-                    surname = ""
-                    name = ""
-                    separator = ""
-                    if fullname[0] is not None:
-                        name += fullname[0].lower()
-                        separator = " "
-                    if fullname[1] is not None:
-                        surname += fullname[1].lower()
+                    name, surname = _norm_author(fullname[0], fullname[1])
+                    separator = " " if fullname[0] is not None else ""
                     exist_author = True
                     query += f"&query.author={name}{separator}{surname}"
 
@@ -333,86 +628,180 @@ class Crossref(QueryInterface):
         url_cr = f"https://api.crossref.org/works?{query}"
 
         try:
-            r_cr = requests.get(url_cr, headers=self.headers, timeout=60)
+            r_cr = self._get(url_cr)
+            if r_cr is None:
+                return None
             hdrs_cr = r_cr.headers
 
             try:
-                r = r_cr.json()
-                possible = []
+                r = orjson.loads(r_cr.content)
                 if "message" in r and "items" in r["message"]:
-                    if r["message"]["items"]:
-                        idx = 0
-                        while idx < len(r["message"]["items"]):
-                            point_year = 0
-                            point_authors = 0
-                            point_title = 0
-                            if year is not None:
-
-                                if "-" in str(year):
-                                    year_tokens = str(year).split("-")
-                                    for element_of_year in year_tokens:
-                                        if len(element_of_year) == 4:
-                                            year = int(element_of_year)
-                                            break
-                                year = int(year)
-
-                                if "issued" in r["message"]["items"][idx].keys():
-                                    if "date-parts" in r["message"]["items"][idx]["issued"].keys():
-                                        if r["message"]["items"][idx]["issued"]["date-parts"][0][0] is not None:
-                                            paper_year = int(r["message"]["items"][idx]["issued"]["date-parts"][0][0])
-                                            if paper_year == year:
-                                                point_year += 3
-                            if exist_author:
-                                if "author" in r["message"]["items"][idx].keys():
-
-                                    for n in r["message"]["items"][idx]["author"]:
-                                        if "family" in n.keys():
-                                            if "given" in n.keys():
-                                                if n["family"].lower() == surname and n["given"].lower() == name:
-                                                    point_authors += 2
-                                                elif n["family"].lower() == surname and n["given"].lower()[0] == name[
-                                                    0]:
-                                                    point_authors += 1
-                                            elif n["family"].lower() == surname:
-                                                point_authors += 1
-
-                            if "title" in r["message"]["items"][idx].keys():
-                                title_pub = r["message"]["items"][idx]["title"][0].lower()
-                                point_title = Levenshtein.ratio(title, title_pub)
-
-                            possible.append((point_title, point_authors, point_year, idx))
-                            idx += 1
-
-                        sort = sorted(possible)
-
-                        if sort[-1][0] > 0.8:
-                            if exist_author and sort[-1][1] < 1:
-                                return None
-                            # if year is not None and sort[-1][2] < 1:
-                            #    return None
-                            res = r["message"]["items"][sort[-1][3]]
-                            return res["DOI"]
+                    return self._best_doi(r["message"]["items"], title, year,
+                                          (name, surname) if exist_author else None)
 
             except Exception as ex1:
                 # ex1.with_traceback()
                 if hdrs_cr["content-type"] == 'text/plain' or hdrs_cr["content-type"] == 'text/html':
-                    r = r_cr.text
-                    if "503" in r:
-                        time.sleep(5.0)
-                        solution = self.query(fullnames, title, year)
-                        return solution
-                    else:
-                        print("[GraphEnricher-Crossref-std1]:" + repr(ex1) + "__" + url_cr + "__" + r)
+                    print("[GraphEnricher-Crossref-std1]:" + repr(ex1) + "__" + url_cr + "__" + r_cr.text)
                 else:
                     print("[GraphEnricher-Crossref-std2]:" + repr(ex1) + "__" + url_cr + "__" + hdrs_cr["content-type"])
 
-        except Exception as ex0:
+        except Exception:
             # ex0.with_traceback()
-            if "ConnectTimeout" in repr(ex0):
-                print("[GraphEnricher-Crossref]:" + repr(ex0) + "__" + url_cr)
-                time.sleep(5.0)
-                solution = self.query(fullnames, title, year)
-                return solution
+            return None
+
+    @staticmethod
+    def _best_doi(items: list, title: str, year: str, author: tuple = None):
+        """ Choose, among the works returned by Crossref, the one that best matches the title, the year of
+        publication and the author given, if its title is similar enough
+
+        :param items: the works returned by Crossref
+        :param title: the title of the paper
+        :param year: a string that represent the year of publication
+        :param author: a tuple <name, family_name>, already cleaned, or None
+        :return: the DOI of the best match, otherwise None
+        """
+        if not items:
+            return None
+
+        # Score all the candidate titles at once: the ones below the threshold are not relevant.
+        # The similarity of two strings is at most 2 * min(la, lb) / (la + lb), so the candidates
+        # that can't reach the threshold because of their length alone are skipped right away.
+        query_title = title.lower()
+        titles = {}
+        for i, item in enumerate(items):
+            if "title" in item:
+                title_pub = item["title"][0].lower()
+                la, lb = len(query_title), len(title_pub)
+                if 2 * min(la, lb) >= 0.8 * (la + lb):
+                    titles[i] = title_pub
+        title_scores = {i: score / 100 for _, score, i in
+                        process.extract(query_title, titles, scorer=fuzz.ratio,
+                                        score_cutoff=80, limit=None)}
+        # The year of publication is normalised once, not for every candidate
+        year_int = None
+        if year is not None:
+            year_str = str(year)
+            if "-" in year_str:
+                for element_of_year in year_str.split("-"):
+                    if len(element_of_year) == 4:
+                        year_str = element_of_year
+                        break
+            year_int = int(year_str)
+
+        possible = []
+        for idx, item in enumerate(items):
+            point_year = 0
+            point_authors = 0
+            if year_int is not None:
+                if "issued" in item:
+                    if "date-parts" in item["issued"]:
+                        if item["issued"]["date-parts"][0][0] is not None:
+                            paper_year = int(item["issued"]["date-parts"][0][0])
+                            if paper_year == year_int:
+                                point_year += 3
+            if author is not None:
+                name, surname = author
+                if "author" in item:
+
+                    for n in item["author"]:
+                        if "family" in n:
+                            if "given" in n:
+                                if n["family"].lower() == surname and n["given"].lower() == name:
+                                    point_authors += 2
+                                elif n["family"].lower() == surname and n["given"].lower()[0] == name[0]:
+                                    point_authors += 1
+                            elif n["family"].lower() == surname:
+                                point_authors += 1
+
+            point_title = title_scores.get(idx, 0)
+
+            possible.append((point_title, point_authors, point_year, idx))
+
+        best = max(possible)
+
+        if best[0] > 0.8:
+            if author is not None and best[1] < 1:
+                return None
+            # if year is not None and sort[-1][2] < 1:
+            #    return None
+            return items[best[3]]["DOI"]
+
+    def query_combined(self, issns: list, title: str, year: str):
+        """
+        Method to extract, with a single request, both the DOI of a paper published in a venue with the given ISSNs
+        and any other ISSN of that venue. The works of the venue are searched by means of the title and the best
+        match is chosen as in `query`, while the ISSNs are taken from all the works returned.
+
+        :param issns: the ISSNs already known
+        :param title: the title of the paper
+        :param year: a string that represent the year of publication
+        :return: a dictionary with the DOI found (None if not found) under 'doi' and the list of any other ISSN
+        found under 'issns', otherwise None if the request failed
+        """
+        query = "filter=" + ",".join("issn:" + issn for issn in issns)
+        if title:
+            query += f"&query.bibliographic={self._cleaning_title(title)}"
+        query += "&rows=4&select=DOI,title,author,issued,ISSN"
+        url_cr = f"https://api.crossref.org/works?{query}"
+
+        try:
+            r_cr = self._get(url_cr)
+            if r_cr is None:
+                return None
+            hdrs_cr = r_cr.headers
+
+            try:
+                r = orjson.loads(r_cr.content)
+                items = r["message"]["items"]
+                new_issns = {}
+                for item in items:
+                    for issn in item.get("ISSN", []):
+                        if issn not in issns:
+                            new_issns[issn] = None
+                return {
+                    'doi': self._best_doi(items, title, year) if title else None,
+                    'issns': list(new_issns)
+                }
+
+            except Exception as ex1:
+                # ex1.with_traceback()
+                if hdrs_cr["content-type"] == 'text/plain' or hdrs_cr["content-type"] == 'text/html':
+                    print("[GraphEnricher-Crossref-combined]:" + repr(ex1) + "__" + url_cr + "__" + r_cr.text)
+                else:
+                    print("[GraphEnricher-Crossref-combined]:" + repr(ex1) + "__" + url_cr + "__" + hdrs_cr[
+                        "content-type"])
+
+        except Exception:
+            # ex0.with_traceback()
+            return None
+
+    def query_batch(self, specs: list, max_workers: int = 16) -> list:
+        """
+        Method to extract the DOIs of a batch of bibliographic resources. Requests that are repeated in the batch
+        are sent only once, while the remaining ones are run concurrently.
+
+        :param specs: a list of tuples <fullnames, title, year>, each one with the same meaning of the arguments
+        of `query`
+        :param max_workers: the maximum number of concurrent requests
+        :return: a list containing the DOI found for each tuple (None if not found), in the same order of specs
+        """
+        keys = []
+        unique_specs = {}
+        for fullnames, title, year in specs:
+            key = self._batch_key(fullnames, title, year)
+            keys.append(key)
+            unique_specs.setdefault(key, (fullnames, title, year))
+
+        results = dict(zip(unique_specs, self.query_many(list(unique_specs.values()), max_workers)))
+        # Keep the results, so that a later `query` with the same arguments doesn't send any request
+        self._prefetched.update(results)
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def _batch_key(fullnames: list, title: str, year: str) -> tuple:
+        names = tuple(n if isinstance(n, str) else tuple(n) for n in fullnames or [])
+        return names, title, year
 
 
 class ORCID(QueryInterface):
@@ -428,8 +817,10 @@ class ORCID(QueryInterface):
                  timeout=30,
                  repok=None,
                  reperr=None,
-                 is_json=True):
-        super().__init__()
+                 is_json=True,
+                 session: requests_cache.CachedSession = None,
+                 result_cache: ResultCache = None):
+        super().__init__(session, result_cache)
 
         self.max_iteration = max_iteration
         self.sec_to_wait = sec_to_wait
@@ -438,6 +829,9 @@ class ORCID(QueryInterface):
         self.is_json = is_json
         self.__orcid_api_url = 'https://pub.orcid.org/v2.1/search?q='
         self.__personal_url = "https://pub.orcid.org/v2.1/%s/personal-details"
+        # Only the parsed results are kept between different runs, not the raw responses
+        self._memoize('_ORCID__get_data', persist=False)
+        self._memoize('_match_orcids')
 
     def query(self, authors: list, identifiers: list):
         """
@@ -447,92 +841,98 @@ class ORCID(QueryInterface):
         :param identifiers: a list of identifiers of the bibliographic resource
         :return: the authors list enriched with the ORCID identifier
         """
-        to_return = {}
-
         if len(identifiers) == 0:
             return None
 
-        returned_orcids = 0
+        # The agent objects are left out of the (memoized) lookup, since they don't take part in it
+        orcids = self._match_orcids(tuple((a[0], a[1], a[2]) for a in authors),
+                                    tuple((i[0], i[1]) for i in identifiers))
+        if orcids is None:
+            orcids = [None] * len(authors)
+        return [(a[0], a[1], orcid, a[3]) for a, orcid in zip(authors, orcids)]
 
-        records = self._get_orcid_records(identifiers, authors)
-        if records is not None:
+    def _match_orcids(self, authors: tuple, identifiers: tuple) -> tuple:
+        """
+        Search ORCID by means of the identifiers of a bibliographic resource and of the names of its authors, and
+        match the records found with the authors
 
-            for orcid_id in self.__dict_get(records, ["result", "orcid-identifier", "path"]):
-                personal_details = self.__get_data(self.__personal_url % orcid_id.upper())
+        :param authors: a tuple of tuples in the following form ( (name, family_name, ORCID) )
+        :param identifiers: a tuple of tuples <scheme, literal> of the bibliographic resource
+        :return: a tuple with the ORCID found for each author (None if not found), in the same order of authors,
+        or None if ORCID couldn't be searched (so that the result is not kept in the persistent cache)
+        """
+        to_return = {}
 
-                if personal_details is not None:
-                    given_name = self.__dict_get(personal_details, ["name", "given-names", "value"])
-                    family_name = self.__dict_get(personal_details, ["name", "family-name", "value"])
+        records = self._get_orcid_records(identifiers, authors)
+        if records is None:
+            return None
 
-                    for a in authors:
-                        if a[2] is None:
+        orcid_ids = [orcid_id.upper() for orcid_id in
+                     self.__dict_get(records, ["result", "orcid-identifier", "path"]) or []
+                     if orcid_id is not None]
 
-                            if to_return.get((a[0], a[1])) is None and a[1] is not None and family_name is not None:
-                                if a[1].lower() in family_name:
-                                    to_return[(a[0], a[1])] = orcid_id.upper()
+        # The personal details of the candidates are independent requests: fetch them concurrently
+        if len(orcid_ids) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent_requests, len(orcid_ids))) as executor:
+                details = list(executor.map(lambda oid: self.__get_data(self.__personal_url % oid), orcid_ids))
+        else:
+            details = [self.__get_data(self.__personal_url % oid) for oid in orcid_ids]
 
-                                    if a[0] is not None and given_name is not None:
-                                        if a[0].lower() in given_name:
-                                            to_return[(a[0], a[1])] = orcid_id.upper()
+        # Candidates in the order returned by ORCID, each one with its (lower case) family name
+        candidates = []
+        for orcid_id, personal_details in zip(orcid_ids, details):
+            if personal_details is not None:
+                family_name = self.__dict_get(personal_details, ["name", "family-name", "value"])
+                if family_name is not None:
+                    candidates.append((orcid_id, family_name))
 
-        authors_to_return = []
-        for a in authors:
-            orcid = to_return.get((a[0], a[1]))
-            if orcid is not None:
-                returned_orcids += 1
-            authors_to_return.append((a[0], a[1], orcid, a[3]))
+        # Position of the first candidate with each family name, to resolve exact matches with a lookup
+        first_by_family = {}
+        for idx, (orcid_id, family_name) in enumerate(candidates):
+            first_by_family.setdefault(family_name, idx)
 
-        return authors_to_return
+        for a in authors:
+            if a[2] is None and a[1] is not None and to_return.get((a[0], a[1])) is None:
+                author_family = a[1].lower()
+                # An author is given the first candidate whose family name contains its own: only the ones
+                # preceding the first exact match need to be scanned for a partial match
+                end = first_by_family.get(author_family, len(candidates))
+                match = next((orcid_id for orcid_id, family_name in candidates[:end]
+                              if author_family in family_name), None)
+                if match is None and end < len(candidates):
+                    match = candidates[end][0]
+                if match is not None:
+                    to_return[(a[0], a[1])] = match
+
+        return tuple(to_return.get((a[0], a[1])) for a in authors)
 
     def _get_orcid_records(self, identifiers: list, family_names: list =[]):
-        cur_query = ""
-
-        i_counter = 0
-
-        for i in identifiers:
-            if i[0] == GraphEntity.iri_doi:
-                if i[1] is None:
-                    continue
-                if i_counter == 0:
-                    cur_query += "("
-
-                if i_counter >= 1:
-                    cur_query += " OR "
-
-                doi_string = i[1]
-                cur_query += "doi-self:\"%s\"" % doi_string
-                doi_string_l = doi_string.lower()
-                doi_string_u = doi_string.upper()
-
-                if doi_string_l != doi_string or doi_string_u != doi_string:
-                    if doi_string_l != doi_string:
-                        cur_query += " OR doi-self:\"%s\"" % doi_string_l
-                    if doi_string_u != doi_string:
-                        cur_query += " OR doi-self:\"%s\"" % doi_string_u
-
-            elif i[0] == GraphEntity.iri_isbn:
-                if i_counter == 0:
-                    cur_query += "("
-                if i_counter >= 1:
-                    cur_query += " OR "
-                isbn_string = i[1]
-                cur_query += "isbn:\"%s\"" % isbn_string
-
-            elif i[0] == GraphEntity.iri_pmid:
-
-                if i_counter == 0:
-                    cur_query += "( "
-                if i_counter >= 1:
-                    cur_query += " OR "
-                pmid_string = i[1]
-                cur_query += "pmid-self:\"%s\"" % pmid_string
-            else:
+        # The query is built piece by piece and joined only once at the end
+        parts = []
+        iri_doi = GraphEntity.iri_doi
+        iri_isbn = GraphEntity.iri_isbn
+        iri_pmid = GraphEntity.iri_pmid
+
+        # A dict is used as an ordered set, so that the same identifier (or the same case variant of a DOI) is not
+        # repeated in the query when it's carried by more than one entity
+        terms = {}
+        for scheme, literal in identifiers:
+            if literal is None:
                 continue
-
-            i_counter += 1
-
-        if i_counter > 0:
-            cur_query += ") "
+            if scheme == iri_doi:
+                # The DOI is searched also in lower and upper case, since ORCID matches it as it's been registered
+                terms["doi-self:\"%s\"" % literal] = None
+                terms["doi-self:\"%s\"" % literal.lower()] = None
+                terms["doi-self:\"%s\"" % literal.upper()] = None
+            elif scheme == iri_isbn:
+                terms["isbn:\"%s\"" % literal] = None
+            elif scheme == iri_pmid:
+                terms["pmid-self:\"%s\"" % literal] = None
+
+        if terms:
+            parts.append("(")
+            parts.append(" OR ".join(terms))
+            parts.append(") ")
         if family_names:
             first_name = True
             for idx, full_name in enumerate(family_names):
@@ -541,24 +941,21 @@ class ORCID(QueryInterface):
                 if family_name is not None:
                     if first_name:
                         first_name = False
-                        if len(identifiers) and cur_query != "":
-                            cur_query += "AND ("
-                    elif cur_query != "":
-                        cur_query += " OR "
+                        if len(identifiers) and parts:
+                            parts.append("AND (")
+                    elif parts:
+                        parts.append(" OR ")
                     if family_name:
-                        cur_query += "family-name:\"%s\"" % \
-                                     unicodedata.normalize('NFKD', "" + family_name). \
-                                         encode("ASCII", "ignore").decode("utf-8")
+                        parts.append("family-name:\"%s\"" % _ascii_fold(family_name))
                     if given_names:
-                        cur_query += " AND "
-                        cur_query += "given-names:\"%s\"" % \
-                                     unicodedata.normalize('NFKD', "" + given_names). \
-                                         encode("ASCII", "ignore").decode("utf-8")
+                        parts.append(" AND ")
+                        parts.append("given-names:\"%s\"" % _ascii_fold(given_names))
 
             # close query if has started with the doi thing
             if len(identifiers):
-                cur_query += ")"
+                parts.append(")")
 
+        cur_query = "".join(parts)
         if cur_query != "":
             self.__last_query_done = self.__orcid_api_url + quote(cur_query)
             returned_data = self.__get_data(self.__orcid_api_url + quote(cur_query))
@@ -567,24 +964,19 @@ class ORCID(QueryInterface):
             return None
 
     def __dict_get(self, d, key_list):
-        if key_list:
-            if type(d) is dict:
-                k = key_list[0]
-                if k in d:
-                    return self.__dict_get(d[k], key_list[1:])
-                else:
+        # Walk down the dictionaries in a loop, descending into each element only when a list is met
+        for idx, k in enumerate(key_list):
+            d_type = type(d)
+            if d_type is dict:
+                if k not in d:
                     return None
-            elif type(d) is list:
-                result = []
-                for item in d:
-                    value = [self.__dict_get(item, key_list)]
-                    if value is not None:
-                        result += value
-                return result
+                d = d[k]
+            elif d_type is list:
+                remaining = key_list[idx:]
+                return [self.__dict_get(item, remaining) for item in d]
             else:
                 return None
-        else:
-            return d.lower()
+        return d.lower() if type(d) is str else d
 
     @staticmethod
     def __dict_add(d):
@@ -597,70 +989,43 @@ class ORCID(QueryInterface):
 
     def __get_data(self, get_url):
         """
-        Method to send requests
+        Method to send requests, retried with a backoff by `_get`
 
         :param get_url: the URL to query
         :return: results if found, otherwise None
         """
-        tentative = 0
-        error_no_200 = False
-        error_read = False
-        error_connection = False
-        error_generic = False
-        errors = []
-        while tentative < self.max_iteration:
-            if tentative != 0:
-                sleep(self.sec_to_wait)
-            tentative += 1
+        try:
+            response = self._get(get_url, timeout=self.timeout)
+        except RequestException as e:
+            log.warning("[GraphEnricher-ORCID]: request error: %r: %s", e, get_url)
+            return None
+
+        if response is None:
+            log.error("[GraphEnricher-ORCID]: giving up after %d attempts: %s", self.max_iteration, get_url)
+            return None
 
+        if response.status_code == 200:
+            if not self.is_json:
+                return response.text
             try:
-                response = requests.get(get_url, headers=self.headers, timeout=self.timeout)
-                if response.status_code == 200:
-                    if self.is_json:
-                        return json.loads(response.text)
-                    else:
-                        return response.text
-                else:
-                    err_string = "We got an HTTP error when retrieving data (HTTP status code: %s)." % \
-                                 str(response.status_code)
-                    if not error_no_200:
-                        error_no_200 = True
-                    if response.status_code == 404:
-                        # print(err_string + " However, the process could continue anyway.")
-                        # If the resource has not found, we can break the process immediately,
-                        # by returning None so as to allow the callee to continue (or not) the process
-                        return None
-                    else:
-                        errors += [err_string]
-
-            except ReadTimeout as e:
-                if not error_read:
-                    error_read = True
-                    errors += ["A timeout error happened when reading results from the API "
-                               "when retrieving data. %s" % e]
-            except ConnectTimeout as e:
-                if not error_connection:
-                    error_connection = True
-                    errors += ["A timeout error happened when connecting to the API "
-                               "when retrieving data. %s" % e]
-            except Exception:
-                if not error_generic:
-                    error_generic = True
-                    errors += ["A generic error happened when trying to use the API "
-                               "when retrieving data. %s" % sys.exc_info()[0]]
-
-        # If the process comes here, no valid result has been returned
-        print(" | ".join(errors) + "\n\tRequested URL: " + get_url)
+                return orjson.loads(response.content)
+            except orjson.JSONDecodeError as e:
+                log.warning("[GraphEnricher-ORCID]: invalid JSON: %r: %s", e, get_url)
+        elif response.status_code != 404:
+            # If the resource has not been found, None is returned as well, but there's nothing to report
+            log.warning("[GraphEnricher-ORCID]: HTTP error %s: %s", response.status_code, get_url)
+        return None
 
 
 class OpenAlex(QueryInterface):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, session: requests_cache.CachedSession = None, result_cache: ResultCache = None):
+        super().__init__(session, result_cache)
         self.headers = {
             "User-Agent": "GraphEnricher (via OpenCitations - http://opencitations.net;  mailto:contact@opencitations.net)"}
         self.api_url_works = 'https://api.openalex.org/works'
         self.api_url_sources = 'https://api.openalex.org/sources'
+        self._memoize('query')
 
     def query(self, entity:str, schema:str):
 
@@ -668,15 +1033,20 @@ class OpenAlex(QueryInterface):
 
         if schema in ['doi', 'pmid', 'pmcid']:
             query = f"{self.api_url_works}?filter={schema}:{entity}&select=id"
-        if schema == 'issn':
+        elif schema == 'issn':
             query = f"{self.api_url_sources}?filter={schema}:{entity}&select=id"
+        else:
+            print("[GraphEnricher-OpenAlex]:" + f"The specified schema '{schema}' is not supported")
+            return None
 
         try:
-            resp = requests.get(query, headers=self.headers, timeout=60)
+            resp = self._get(query)
+            if resp is None:
+                return None
             hdrs = resp.headers
 
             try:
-                r = resp.json()
+                r = orjson.loads(resp.content)
                 if not r['results']:
                     return None
                 else:
@@ -685,28 +1055,10 @@ class OpenAlex(QueryInterface):
 
             except Exception as ex1:
                 if hdrs["content-type"] == 'text/plain' or hdrs["content-type"] == 'text/html':
-                    r = resp.text
-                    if "503" in r:
-                        time.sleep(5.0)
-                        solution = self.query(entity, schema)
-                        return solution
-                    elif "429" in r:  # only handles per-second rate limit (not daily rate limit)
-                        time.sleep(0.2)
-                        solution = self.query(entity, schema)
-                        return solution
-                    else:
-                        print("[GraphEnricher-OpenAlex]:" + repr(ex1) + "__" + query + "__" + r)
+                    print("[GraphEnricher-OpenAlex]:" + repr(ex1) + "__" + query + "__" + resp.text)
                 else:
                     print(
                         "[GraphEnricher-OpenAlex]:" + repr(ex1) + "__" + query + "__" + hdrs["content-type"])
 
         except Exception as ex0:
-            if "ConnectTimeout" in repr(ex0):
-                print("[GraphEnricher-OpenAlex]:" + repr(ex0) + "__" + query)
-                time.sleep(5.0)
-                solution = self.query(entity, schema)
-                return solution
-            if "UnboundLocalError" in repr(ex0):
-                print("[GraphEnricher-OpenAlex]:" + repr(ex0) + "__" + f"The specified schema '{schema}' is not supported")
-            else:
-                print("[GraphEnricher-OpenAlex]:" + repr(ex0) + "__" + query)
+            print("[GraphEnricher-OpenAlex]:" + repr(ex0) + "__" + query)
@@ -12,6 +12,8 @@ OF THIS SOFTWARE.
 """
 __author__ = "Gabriele Pisciotta"
 
+import os
+import tempfile
 from unittest import TestCase
 from oc_graphenricher.APIs import *
 
@@ -30,10 +32,22 @@ class TestAPI(TestCase):
                                    2018) != '10.1136/injuryprevention-2018-safety.431':
             self.fail()
 
+    def test_crossref_doi_batch(self):
+        title = "PW 1927 Reviewing the national swimming and water safety education framework: " \
+                "a drowning prevention strategy"
+        res = self.crossref_API.query_batch([([("Stacey", "Willcox-Pidgeon")], title, 2018),
+                                             ([("Stacey", "Willcox-Pidgeon")], title, 2018)])
+        if res != ['10.1136/injuryprevention-2018-safety.431'] * 2:
+            self.fail()
+
     def test_crossref_journal(self):
         if self.crossref_API.query_journal("0008-4026")[0] != '1480-3305':
             self.fail()
 
+    def test_crossref_combined(self):
+        if '1480-3305' not in self.crossref_API.query_combined(["0008-4026"], None, None)['issns']:
+            self.fail()
+
     def test_ORCID(self):
         authors = [("Silvio", "Peroni", None, None)]
         identifiers = [(GraphEntity.iri_doi, "10.32388/LAKK5Q")]
@@ -55,6 +69,16 @@ class TestAPI(TestCase):
         if self.wikidata_API.query("0009-4722", 'issn') != 'Q1119421':
             self.fail()
 
+    def test_Wikidata_result_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "results")
+            with ResultCache(filename) as result_cache:
+                WikiData(result_cache=result_cache).query("0009-4722", 'issn')
+            with ResultCache(filename) as result_cache:
+                found, value = result_cache.get("WikiData.query:('0009-4722', 'issn')")
+        if not found or value != 'Q1119421':
+            self.fail()
+
     def test_Wikidata_orcid(self):
         if self.wikidata_API.query("0000-0002-7398-5483", 'orcid') != 'Q5345':
             self.fail()
@@ -86,3 +110,11 @@ class TestAPI(TestCase):
     def test_OpenAlex_pmcid(self):
         if self.openalex_API.query('1457197', 'pmcid') != ['W114870970']:
             self.fail()
+
+    def test_Wikidata_many(self):
+        if self.wikidata_API.query_many([("0009-4722", 'issn'), ("24715915", 'viaf')]) != ['Q1119421', 'Q1228']:
+            self.fail()
+
+    def test_Wikidata_batch(self):
+        if self.wikidata_API.query_batch(["15774072", "0"], 'pmid') != {"15774072": 'Q21092898'}:
+            self.fail()
@@ -15,20 +15,100 @@ __author__ = "Gabriele Pisciotta"
 
 import contextlib
 import datetime
+import os
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 
 import requests_cache
-from oc_graphenricher.APIs import Crossref, ORCID, VIAF, WikiData, OpenAlex
+from oc_graphenricher.APIs import Crossref, ORCID, VIAF, WikiData, OpenAlex, ResultCache, build_session
 from oc_ocdm import Storer
 from oc_ocdm.graph import GraphSet
 from oc_ocdm.graph.entities.bibliographic.bibliographic_resource import BibliographicResource
 from oc_ocdm.graph.entities.bibliographic.responsible_agent import ResponsibleAgent
+from oc_ocdm.graph.entities.identifier import Identifier
 from oc_ocdm.graph.graph_entity import GraphEntity
 from oc_ocdm.prov import ProvSet
 from tqdm import tqdm
 from tqdm.contrib import DummyTqdmFile
 
+# The IRIs of the identifier schemes, of the roles and of the types used by the enricher, resolved once
+_IRI_DOI = GraphEntity.iri_doi
+_IRI_ISSN = GraphEntity.iri_issn
+_IRI_PMID = GraphEntity.iri_pmid
+_IRI_PMCID = GraphEntity.iri_pmcid
+_IRI_ORCID = GraphEntity.iri_orcid
+_IRI_VIAF = GraphEntity.iri_viaf
+_IRI_CROSSREF = GraphEntity.iri_crossref
+_IRI_WIKIDATA = GraphEntity.iri_wikidata
+_IRI_OPENALEX = GraphEntity.iri_openalex
+_IRI_AUTHOR = GraphEntity.iri_author
+_IRI_PUBLISHER = GraphEntity.iri_publisher
+_IRI_JOURNAL_ISSUE = GraphEntity.iri_journal_issue
+_IRI_JOURNAL_VOLUME = GraphEntity.iri_journal_volume
+
+# The IRI of the scheme of the identifiers that the enricher can add, by schema name
+_SCHEMA_IRI = {
+    'issn': _IRI_ISSN,
+    'doi': _IRI_DOI,
+    'orcid': _IRI_ORCID,
+    'viaf': _IRI_VIAF,
+    'crossref': _IRI_CROSSREF,
+    'wikidata': _IRI_WIKIDATA,
+    'openalex': _IRI_OPENALEX
+}
+
+# The method that sets the literal of a new identifier, by schema name
+_ID_CREATORS = {
+    'issn': Identifier.create_issn,
+    'doi': Identifier.create_doi,
+    'orcid': Identifier.create_orcid,
+    'viaf': Identifier.create_viaf,
+    'crossref': Identifier.create_crossref,
+    'wikidata': Identifier.create_wikidata,
+    'openalex': Identifier.create_openalex
+}
+
+# The schemes of the identifiers of a BR that are searched on Wikidata, in order of priority, with the schema
+# used by the Wikidata API client and a label for the debug messages
+_WD_PROBES = (
+    (_IRI_DOI, 'doi', 'DOI'),
+    (_IRI_ISSN, 'issn', 'ISSN'),
+    (_IRI_PMID, 'pmid', 'PMID'),
+    (_IRI_PMCID, 'pmcid', 'PMCID')
+)
+# The schemes of the identifiers that are looked up for an author
+_AUTHOR_SCHEMES = frozenset((_IRI_ORCID, _IRI_VIAF, _IRI_WIKIDATA))
+# The schemes of the identifiers that an entity can have only one of
+_SINGLE_ID_SCHEMES = frozenset((_IRI_ORCID, _IRI_VIAF, _IRI_WIKIDATA))
+# The schema and the label of each BR identifier that can be searched on OpenAlex, by IRI of its scheme
+_OA_SCHEMES = {iri: (schema, label) for iri, schema, label in _WD_PROBES}
+
+
+def _is_issue_or_volume(br: BibliographicResource) -> bool:
+    """ Tell if a BR is a journal issue or a journal volume, which are not enriched
+
+    :param br: the bibliographic resource
+    :return: True if the BR is an issue or a volume, False otherwise
+    """
+    types = br.get_types()
+    return _IRI_JOURNAL_ISSUE in types or _IRI_JOURNAL_VOLUME in types
+
+
+def _index_identifiers(identifiers: list) -> dict:
+    """ Group the literals of a list of identifiers by their scheme
+
+    :param identifiers: a list of tuples <scheme, literal>
+    :return: a dictionary mapping each scheme to the list of its literals, in the same order of the input
+    """
+    index = {}
+    for scheme, literal in identifiers:
+        index.setdefault(scheme, []).append(literal)
+    return index
+
 
 class GraphEnricher:
     """
@@ -44,7 +124,10 @@ class GraphEnricher:
                  provenance_filename: str = "provenance.rdf",
                  info_dir: str = "",
                  debug: bool = False,
-                 serialize_in_the_middle: bool = False):
+                 serialize_in_the_middle: bool = False,
+                 workers: int = 8,
+                 session: requests_cache.CachedSession = None,
+                 result_cache: ResultCache = None):
         """
 
         :param g_set: graph set to be enriched
@@ -54,16 +137,23 @@ class GraphEnricher:
         :param debug: a bool flag to enable richer output
         :param serialize_in_the_middle: a bool flag to enable the serialization each 50 Bibliographic Resources (BRs)
         processed (the resulting file will be always overwritten, this may slow the whole process)
+        :param workers: the number of BRs whose identifiers are looked up concurrently, and of authors looked up
+        concurrently for all of them
+        :param session: the HTTP session used by all the API clients (a new cached session is created if not
+        specified)
+        :param result_cache: the persistent cache where all the API clients keep the results found between different
+        runs (the results are kept in memory only if not specified). It's not closed by the enricher
         """
 
-        requests_cache.install_cache('GraphEnricher_cache')
-
         self.resp_agent = 'https://w3id.org/oc/meta/prov/pa/2'
-        self.crossref_api = Crossref()
-        self.orcid_api = ORCID()
-        self.viaf_api = VIAF()
-        self.wikidata_api = WikiData()
-        self.openalex_api = OpenAlex()
+        # The session is closed by `close` only if it has been created here
+        self._owns_session = session is None
+        self.session = session if session is not None else build_session()
+        self.crossref_api = Crossref(session=self.session, result_cache=result_cache)
+        self.orcid_api = ORCID(session=self.session, result_cache=result_cache)
+        self.viaf_api = VIAF(session=self.session, result_cache=result_cache)
+        self.wikidata_api = WikiData(session=self.session, result_cache=result_cache)
+        self.openalex_api = OpenAlex(session=self.session, result_cache=result_cache)
         self.g_set = g_set
         self.debug = debug
         self.new_id_found = 0
@@ -71,6 +161,30 @@ class GraphEnricher:
         self.provenance_filename = provenance_filename
         self.info_dir = info_dir
         self.serialize_in_the_middle = serialize_in_the_middle
+        self.workers = max(1, workers)
+        # The pool where the authors of all the BRs in flight are looked up, while `enrich` is running
+        self._author_executor = None
+        self._graph_lock = threading.Lock()
+        # The literals and the schemes of the identifiers of each entity met, to check for duplicates
+        self._literal_index = {}
+        # The storer of the graph set, created at the first serialization and reused by the following ones
+        self._gs_storer = None
+        # The number of ORCID and VIAF queries avoided because the author had no name to search for
+        self.skipped_lookups = 0
+        self._skipped_lookups_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """ Release the connections kept open by the HTTP session of the API clients. A session given in input to the
+        constructor is left open, since it's owned by the caller
+        """
+        if self._owns_session:
+            self.session.close()
 
     def enrich(self) -> None:
         """ The enricher iterates each BR contained in the graph set.
@@ -89,6 +203,9 @@ class GraphEnricher:
             - If the AR is related to a publisher, it query Crossref to get its ID by means of its DOI
         Any new identifier found will be added to the AR.
 
+        The lookups of up to `workers` BRs are run concurrently, while the identifiers found are added to the graph
+        set one BR at a time, in the order of the BRs: this way the output doesn't depend on `workers`.
+
         In the end it will store a new graph set and its provenance.
 
         NB: Even if it's not possible to have an identifier duplicated for the same entity, it's possible that in
@@ -96,172 +213,88 @@ class GraphEnricher:
         purpose, you should use the `instancematching` module after that you've enriched the graph set.
         """
         br_enriched_counter = 0
-        with self.__std_out_err_redirect_tqdm() as orig_stdout:
-
-            progress_bar = tqdm(self.g_set.get_br(), file=orig_stdout, dynamic_ncols=True)
-            for br in progress_bar:
-                progress_bar.set_description(desc=f"New ID found: {self.new_id_found}")
-
-                br_enriched_counter += 1
-                if br_enriched_counter % 50 == 0 and self.serialize_in_the_middle:
-                    gs_storer = Storer(self.g_set, output_format="nt11")
-                    gs_storer.store_graphs_in_file(self.graph_filename, "")
-
-                if GraphEntity.iri_journal_issue in br.get_types() or GraphEntity.iri_journal_volume in br.get_types():
-                    continue
-
-                authors = []
-                publisher_has_crossrefid = False
-
-                # Extract br's identifiers
-                has_doi = None
-                has_issn = []
-                has_wikidata = []
-                has_openalex = None
-                for i in br.get_identifiers():
-                    if i.get_scheme() == br.iri_doi:
-                        has_doi = i.get_literal_value()
-                    elif i.get_scheme() == br.iri_issn:
-                        has_issn.append(i.get_literal_value())
-                    elif i.get_scheme() == br.iri_wikidata:
-                        has_wikidata.append(i.get_literal_value())
-                    elif i.get_scheme() == br.iri_openalex:
-                        has_openalex = i.get_literal_value()
-
-                # Get more ISSNs
-                if len(has_issn) > 0:
-                    for issn in has_issn:
-                        res = self.crossref_api.query_journal(issn)
-                        if res:
-                            for r in res:
-                                # To avoid to add already present ISSNs
-                                if r not in has_issn:
-                                    self._add_id(br, r, 'issn', "its ISSN {}".format(issn))
-                            break
-
-                # If no DOI try to get it
-                if has_doi is None:
-                    res = self.crossref_api.query(authors, br.get_title(), br.get_pub_date())
-                    if res:
-                        self._add_id(br, res, 'doi', "Crossref query")
-                        has_doi = res
-
-                # If it hasn't a Wikidata ID, extract br's identifiers and search on wikidata for that IDs
-                if len(has_wikidata) == 0:
-                    for i in br.get_identifiers():
-                        if i.get_scheme() == br.iri_doi:
-                            res = self.wikidata_api.query(i.get_literal_value(), 'doi')
-                            if res:
-                                self._add_id(br, res, 'wikidata', "its DOI".format(i.get_literal_value()))
-                                break
-                        elif i.get_scheme() == br.iri_issn:
-                            res = self.wikidata_api.query(i.get_literal_value(), 'issn')
-                            if res:
-                                self._add_id(br, res, 'wikidata', "its ISSN {}".format(i.get_literal_value()))
-                                break
-                        elif i.get_scheme() == br.iri_pmid:
-                            res = self.wikidata_api.query(i.get_literal_value(), 'pmid')
-                            if res:
-                                self._add_id(br, res, 'wikidata', "its PMID {}".format(i.get_literal_value()))
-                                break
-                        elif i.get_scheme() == br.iri_pmcid:
-                            res = self.wikidata_api.query(i.get_literal_value(), 'pmcid')
-                            if res:
-                                self._add_id(br, res, 'wikidata', "its PMCID {}".format(i.get_literal_value()))
-                                break
-
-                # If it has no OpenAlex ID, extract br's identifiers and search those IDs in OpenAlex
-                if has_openalex is None:
-                    for i in br.get_identifiers():
-                        if i.get_scheme() == br.iri_issn:
-                            res: list = self.openalex_api.query(i.get_literal_value(), 'issn')
-                            if res:
-                                for oaid in res:
-                                    self._add_id(br, oaid, 'openalex', f"its ISSN {i.get_literal_value()}")
-                        if i.get_scheme() == br.iri_doi:
-                            res = self.openalex_api.query(i.get_literal_value(), 'doi')
-                            if res:
-                                for oaid in res:
-                                    self._add_id(br, oaid, 'openalex', f"its DOI {i.get_literal_value()}")
-                        if i.get_scheme() == br.iri_pmid:
-                            res = self.openalex_api.query(i.get_literal_value(), 'pmid')
-                            if res:
-                                for oaid in res:
-                                    self._add_id(br, oaid, 'openalex', f"its PMID {i.get_literal_value()}")
-                        if i.get_scheme() == br.iri_pmcid:
-                            res = self.openalex_api.query(i.get_literal_value(), 'pmcid')
-                            if res:
-                                for oaid in res:
-                                    self._add_id(br, oaid, 'openalex', f"its PMCID {i.get_literal_value()}")
-
-                for ar in br.get_contributors():
-                    role = ar.get_role_type()
-                    ra: ResponsibleAgent = ar.get_is_held_by()
-
-                    # Extract Authors, with their info and their identifiers
-                    if role == GraphEntity.iri_author:
-                        authors.append((ra.get_given_name(), ra.get_family_name(), ra))
-                        has_orcid = None
-                        has_viaf = None
-                        has_wikidata = None
-
-                        author_id_found = []
-                        for author_identifier in ra.get_identifiers():
-                            if ra.iri_orcid in author_identifier.get_scheme():
-                                has_orcid = author_identifier.get_literal_value()
-                                author_id_found.append((author_identifier.get_literal_value(), 'orcid'))
-                            if br.iri_viaf in author_identifier.get_scheme():
-                                has_viaf = author_identifier.get_literal_value()
-                                author_id_found.append((author_identifier.get_literal_value(), 'viaf'))
-                            if br.iri_wikidata in author_identifier.get_scheme():
-                                has_wikidata = author_identifier.get_literal_value()
-
-                            if has_viaf is not None and has_orcid is not None and has_wikidata is not None:
-                                break
-
-                        if has_orcid is None:
-                            res = self.orcid_api.query(
-                                [(ra.get_given_name(), ra.get_family_name(), None, ra)],
-                                [(x.get_scheme(), x.get_literal_value()) for x in br.get_identifiers()])
-
-                            if res:
-                                for res_tuple in res:
-                                    given_name, family_name, orcid, ra = res_tuple
-                                    if orcid is not None:
-                                        self._add_id(ra, orcid, 'orcid')
-                                        author_id_found.append((orcid, 'orcid'))
-
-                        # Search for the author on Wikidata
-                        if not has_viaf:
-                            viaf = self.viaf_api.query(ra.get_given_name(), ra.get_family_name(), br.get_title())
-                            if viaf is not None:
-                                self._add_id(ra, viaf, 'viaf')
-                                author_id_found.append((viaf, 'viaf'))
-
-                        # If the author doesn't have Wikidata ID
-                        if not has_wikidata:
-                            for literal, scheme in author_id_found:
-                                res = self.wikidata_api.query(literal, scheme)
-                                if res:
-                                    self._add_id(ra, res, 'wikidata', "its {} {}".format(scheme.upper(), literal))
-                                    break
-
-                    # Get Publisher and its identifiers
-                    if role == GraphEntity.iri_publisher:
-
-                        for publisher_id in ra.get_identifiers():
-                            if GraphEntity.iri_crossref in publisher_id.get_scheme():
-                                publisher_has_crossrefid = True
-                                break
-
-                        # If crossref-id not found, search it
-                        if not publisher_has_crossrefid and has_doi is not None:
-                            crossref_id = self.crossref_api.query_publisher(has_doi)
-                            if crossref_id:
-                                self._add_id(ra, crossref_id, 'crossref')
-
-            gs_storer = Storer(self.g_set, output_format="nt11")
-            gs_storer.store_graphs_in_file(self.graph_filename, "")
+        # The output is routed through tqdm only in debug mode, when the enrichment prints what it finds
+        redirect = self.__std_out_err_redirect_tqdm() if self.debug else contextlib.nullcontext(sys.stdout)
+        with redirect as orig_stdout:
+
+            brs = self.g_set.get_br()
+            # The bar is shown from the start, telling what is being looked up before the enrichment begins
+            progress_bar = tqdm(total=len(brs), file=orig_stdout, dynamic_ncols=True)
+            progress_bar.set_description_str("Prefetching Wikidata IDs")
+            self._prefetch_wikidata(brs)
+            progress_bar.set_description_str("Prefetching Crossref DOIs")
+            self._prefetch_crossref(brs)
+            # The time spent prefetching isn't counted in the rate of the BRs enriched
+            progress_bar.set_description_str(None, refresh=False)
+            progress_bar.reset()
+
+            # The lookups of a BR only read an immutable snapshot of it, taken in this thread, and return the
+            # identifiers to be added: the graph set is modified in this thread only. Up to `workers` BRs are in
+            # flight, and a snapshot doesn't see what is being found for the others: an author shared between them
+            # may be looked up more than once, and `_add_id` keeps only the first ORCID, VIAF and Wikidata ID found
+            # The intermediate serializations are run in background, while the enrichment goes on: the graph set
+            # is locked while it's being stored
+            checkpoint = None
+            next_checkpoint = 50
+            last_refresh = time.monotonic()
+            # The authors of all the BRs in flight share a single pool, so that no more than `workers` authors are
+            # looked up at the same time
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                    ThreadPoolExecutor(max_workers=self.workers) as author_executor, \
+                    ThreadPoolExecutor(max_workers=1) as checkpoint_executor:
+                self._author_executor = author_executor
+                try:
+                    # The results are applied in the order the BRs have been submitted, so that the new identifiers
+                    # are always created (and their IRIs given) in the same order
+                    pending = deque()
+                    br_iterator = iter(brs)
+                    exhausted = False
+                    while pending or not exhausted:
+                        while not exhausted and len(pending) < self.workers:
+                            br = next(br_iterator, None)
+                            if br is None:
+                                exhausted = True
+                                continue
+                            with self._graph_lock:
+                                if _is_issue_or_volume(br):
+                                    br_enriched_counter += 1
+                                    progress_bar.update()
+                                else:
+                                    snapshot = self._snapshot(br)
+                                    pending.append(executor.submit(self._collect_enrichments, snapshot))
+
+                        if not pending:
+                            continue
+                        edits = pending.popleft().result()
+                        with self._graph_lock:
+                            for entity, literal, schema, by_means_of in edits:
+                                self._add_id(entity, literal, schema, by_means_of)
+
+                        br_enriched_counter += 1
+                        progress_bar.update()
+
+                        # The bar is redrawn with the number of new IDs at most once per second
+                        progress_bar.set_postfix_str(f"new={self.new_id_found}", refresh=False)
+                        if time.monotonic() - last_refresh > 1:
+                            progress_bar.refresh()
+                            last_refresh = time.monotonic()
+
+                        if self.serialize_in_the_middle and br_enriched_counter >= next_checkpoint:
+                            next_checkpoint = (br_enriched_counter // 50 + 1) * 50
+                            # If the previous serialization is still running, this one is skipped
+                            if checkpoint is None or checkpoint.done():
+                                if checkpoint is not None:
+                                    checkpoint.result()
+                                checkpoint = checkpoint_executor.submit(self._store_graph)
+
+                    if checkpoint is not None:
+                        checkpoint.result()
+                finally:
+                    self._author_executor = None
+
+            progress_bar.close()
+
+            self._store_graph()
 
             prov = ProvSet(self.g_set, self.g_set.base_iri, info_dir=self.info_dir)
             prov.generate_provenance()
@@ -269,6 +302,296 @@ class GraphEnricher:
             prov_storer = Storer(prov, output_format="nquads")
             prov_storer.store_graphs_in_file(self.provenance_filename, "")
 
+            if self.debug:
+                print("ORCID/VIAF queries skipped for authors without a name: {}".format(self.skipped_lookups))
+
+        # The results kept in memory are only useful within a single run
+        for api in (self.crossref_api, self.orcid_api, self.viaf_api, self.wikidata_api, self.openalex_api):
+            api.clear_cache()
+        self._literal_index.clear()
+
+    def _store_graph(self) -> None:
+        """ Serialize the graph set into the graph file. The graph is written to a temporary file first, which then
+        replaces the old one: this way an interrupted serialization never leaves a truncated file behind. The lock
+        file that the storer creates next to the temporary file is removed as well
+        """
+        tmp_filename = self.graph_filename + ".tmp"
+        with self._graph_lock:
+            if self._gs_storer is None:
+                self._gs_storer = Storer(self.g_set, output_format="nt11")
+            self._gs_storer.store_graphs_in_file(tmp_filename, "")
+        os.replace(tmp_filename, self.graph_filename)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_filename + ".lock")
+
+    def _prefetch_wikidata(self, brs: list) -> None:
+        """ Look up on Wikidata, with one batch of queries per schema, the identifiers of the BRs and of the authors
+        that don't have a Wikidata ID yet. The results are kept by the Wikidata API client, so that the lookups done
+        during the enrichment don't need a request each
+
+        :param brs: the bibliographic resources that will be enriched
+        """
+        br_schemas = {_IRI_DOI: 'doi', _IRI_ISSN: 'issn',
+                      _IRI_PMID: 'pmid', _IRI_PMCID: 'pmcid'}
+        ra_schemas = {_IRI_ORCID: 'orcid', _IRI_VIAF: 'viaf'}
+        literals = {schema: set() for schema in list(br_schemas.values()) + list(ra_schemas.values())}
+
+        for br in brs:
+            if _is_issue_or_volume(br):
+                continue
+
+            br_ids = [(i.get_scheme(), i.get_literal_value()) for i in br.get_identifiers()]
+            if all(scheme != _IRI_WIKIDATA for scheme, _ in br_ids):
+                for scheme, literal in br_ids:
+                    if scheme in br_schemas:
+                        literals[br_schemas[scheme]].add(literal)
+
+            for ar in br.get_contributors():
+                if ar.get_role_type() == _IRI_AUTHOR:
+                    ra_ids = [(i.get_scheme(), i.get_literal_value()) for i in ar.get_is_held_by().get_identifiers()]
+                    if all(scheme != _IRI_WIKIDATA for scheme, _ in ra_ids):
+                        for scheme, literal in ra_ids:
+                            if scheme in ra_schemas:
+                                literals[ra_schemas[scheme]].add(literal)
+
+        for schema, values in literals.items():
+            if values:
+                self.wikidata_api.query_batch(sorted(values), schema)
+
+    def _prefetch_crossref(self, brs: list) -> None:
+        """ Look up on Crossref, concurrently and before the enrichment starts, the DOIs of the BRs that don't have
+        one. The results are kept by the Crossref API client, so that the lookups done during the enrichment
+        don't need a request each. The BRs with an ISSN are skipped, since their DOI is first looked up together
+        with their ISSNs
+
+        :param brs: the bibliographic resources that will be enriched
+        """
+        specs = []
+        for br in brs:
+            if _is_issue_or_volume(br):
+                continue
+            schemes = {i.get_scheme() for i in br.get_identifiers()}
+            if _IRI_DOI not in schemes and _IRI_ISSN not in schemes:
+                specs.append(([], br.get_title(), br.get_pub_date()))
+
+        if specs:
+            self.crossref_api.query_batch(specs, max_workers=self.workers)
+
+    @staticmethod
+    def _snapshot(br: BibliographicResource) -> dict:
+        """ Read from the graph set everything that is needed to enrich a BR, so that the lookups can be run in
+        another thread without touching the graph set
+
+        :param br: the bibliographic resource to enrich
+        :return: a dictionary with the BR, its title, its publication date, its identifiers as tuples
+        <scheme, literal> and its contributors as tuples <role, ra, given name, family name, identifiers>
+        """
+        contributors = []
+        for ar in br.get_contributors():
+            ra: ResponsibleAgent = ar.get_is_held_by()
+            role = ar.get_role_type()
+            if role == _IRI_AUTHOR:
+                contributors.append((role, ra, ra.get_given_name(), ra.get_family_name(),
+                                     [(i.get_scheme(), i.get_literal_value()) for i in ra.get_identifiers()]))
+            elif role == _IRI_PUBLISHER:
+                contributors.append((role, ra, None, None,
+                                     [(i.get_scheme(), i.get_literal_value()) for i in ra.get_identifiers()]))
+
+        return {
+            "br": br,
+            "title": br.get_title(),
+            "pub_date": br.get_pub_date(),
+            "identifiers": [(i.get_scheme(), i.get_literal_value()) for i in br.get_identifiers()],
+            "contributors": contributors
+        }
+
+    def _collect_enrichments(self, snapshot: dict) -> list:
+        """ Query the APIs to find the new identifiers of a BR and of its contributors. The graph set is never
+        modified here: the identifiers found are returned, so that they can be added by means of `_add_id`
+
+        :param snapshot: the snapshot of the BR, as returned by `_snapshot`
+        :return: a list of tuples <entity, literal, schema, by_means_of>, in the order they have to be added
+        """
+        edits = []
+        br = snapshot["br"]
+        br_ids = list(snapshot["identifiers"])
+        stage = self._stage
+
+        publisher_has_crossrefid = False
+
+        # Extract br's identifiers
+        br_index = _index_identifiers(br_ids)
+        has_doi = br_index[_IRI_DOI][-1] if _IRI_DOI in br_index else None
+        has_issn = list(br_index.get(_IRI_ISSN, []))
+        has_wikidata = br_index.get(_IRI_WIKIDATA, [])
+        has_openalex = br_index[_IRI_OPENALEX][-1] if _IRI_OPENALEX in br_index else None
+
+        # If no DOI, a single request gets both more ISSNs and the DOI, by means of the title and the publication
+        # date, among the works published with the ISSNs already known
+        combined = None
+        if len(has_issn) > 0 and has_doi is None:
+            combined = self.crossref_api.query_combined(has_issn, snapshot["title"], snapshot["pub_date"])
+
+        # Get more ISSNs
+        if combined is not None and combined['issns']:
+            for r in combined['issns']:
+                stage(edits, br, br_ids, r, 'issn', "its ISSN {}".format(", ".join(has_issn)))
+        elif len(has_issn) > 0:
+            for issn in has_issn:
+                res = self.crossref_api.query_journal(issn)
+                if res:
+                    for r in res:
+                        # To avoid to add already present ISSNs
+                        if r not in has_issn:
+                            stage(edits, br, br_ids, r, 'issn', "its ISSN {}".format(issn))
+                    break
+
+        # If no DOI try to get it, by means of the title and the publication date: if it hasn't been found among the
+        # works published with the ISSNs already known, it's searched among all the works
+        if has_doi is None:
+            res = combined['doi'] if combined is not None else None
+            if res is None:
+                res = self.crossref_api.query([], snapshot["title"], snapshot["pub_date"])
+            if res:
+                stage(edits, br, br_ids, res, 'doi', "Crossref query")
+                has_doi = res
+
+        # If it hasn't a Wikidata ID, search on wikidata for br's identifiers, one scheme after the other, until
+        # the first one is found
+        # The index is rebuilt only if an ISSN or a DOI has been found so far
+        if edits:
+            br_index = _index_identifiers(br_ids)
+
+        if len(has_wikidata) == 0:
+            found = False
+            for iri, schema, label in _WD_PROBES:
+                for literal in br_index.get(iri, ()):
+                    res = self.wikidata_api.query(literal, schema)
+                    if res:
+                        stage(edits, br, br_ids, res, 'wikidata', "its {} {}".format(label, literal))
+                        found = True
+                        break
+                if found:
+                    break
+
+        # If it has no OpenAlex ID, extract br's identifiers and search those IDs in OpenAlex
+        if has_openalex is None:
+            for scheme, literal in list(br_ids):
+                if scheme in _OA_SCHEMES:
+                    schema, label = _OA_SCHEMES[scheme]
+                    res: list = self.openalex_api.query(literal, schema)
+                    if res:
+                        for oaid in res:
+                            stage(edits, br, br_ids, oaid, 'openalex', f"its {label} {literal}")
+
+        # The lookups of the authors don't depend on each other, so they are run concurrently. Each agent is
+        # looked up once, even if it appears more than once among the authors of the BR, and the agents that already
+        # have all the identifiers looked for are skipped
+        authors = list({ra: (ra, given_name, family_name, identifiers)
+                        for role, ra, given_name, family_name, identifiers in snapshot["contributors"]
+                        if role == _IRI_AUTHOR
+                        and not _AUTHOR_SCHEMES.issubset(scheme for scheme, _ in identifiers)}.values())
+        author_executor = self._author_executor
+        if len(authors) > 1 and author_executor is not None:
+            author_edits = list(author_executor.map(
+                lambda author: self._lookup_author(*author, br_ids, snapshot["title"]), authors))
+        else:
+            author_edits = [self._lookup_author(*author, br_ids, snapshot["title"]) for author in authors]
+        for found in author_edits:
+            edits.extend(found)
+
+        # Get Publisher and its identifiers
+        for role, ra, _, _, identifiers in snapshot["contributors"]:
+            if role == _IRI_PUBLISHER:
+
+                if any(scheme == _IRI_CROSSREF for scheme, _ in identifiers):
+                    publisher_has_crossrefid = True
+
+                # If crossref-id not found, search it
+                if not publisher_has_crossrefid and has_doi is not None:
+                    crossref_id = self.crossref_api.query_publisher(has_doi)
+                    if crossref_id:
+                        stage(edits, ra, list(identifiers), crossref_id, 'crossref')
+
+        return edits
+
+    def _count_skipped_lookup(self) -> None:
+        with self._skipped_lookups_lock:
+            self.skipped_lookups += 1
+
+    def _lookup_author(self, ra: ResponsibleAgent, given_name: str, family_name: str, identifiers: list,
+                       br_ids: list, title: str) -> list:
+        """ Query the APIs to find the new identifiers of an author (ORCID, VIAF and Wikidata ID)
+
+        :param ra: the responsible agent of the author
+        :param given_name: the given name of the author
+        :param family_name: the family name of the author
+        :param identifiers: the identifiers of the author, as tuples <scheme, literal>
+        :param br_ids: the identifiers of the BR, as tuples <scheme, literal>
+        :param title: the title of the BR
+        :return: a list of tuples <entity, literal, schema, by_means_of>, in the order they have to be added
+        """
+        edits = []
+        ids = list(identifiers)
+        index = _index_identifiers(ids)
+        has_orcid = index.get(_IRI_ORCID)
+        has_viaf = index.get(_IRI_VIAF)
+        has_wikidata = index.get(_IRI_WIKIDATA)
+
+        # The identifiers that can be used to search the author on Wikidata, in the order they have
+        author_id_found = [(literal, 'orcid' if scheme == _IRI_ORCID else 'viaf')
+                           for scheme, literal in ids if scheme == _IRI_ORCID or scheme == _IRI_VIAF]
+
+        # Without a name there is nothing to match the results against
+        has_name = bool(given_name or family_name)
+
+        if has_orcid is None and not (has_name and br_ids):
+            self._count_skipped_lookup()
+        elif has_orcid is None:
+            res = self.orcid_api.query([(given_name, family_name, None, ra)], list(br_ids))
+
+            if res:
+                for _, _, orcid, _ in res:
+                    if orcid is not None:
+                        self._stage(edits, ra, ids, orcid, 'orcid')
+                        author_id_found.append((orcid, 'orcid'))
+
+        # Search for the author on VIAF
+        if not has_viaf and not has_name:
+            self._count_skipped_lookup()
+        elif not has_viaf:
+            viaf = self.viaf_api.query(given_name, family_name, title)
+            if viaf is not None:
+                self._stage(edits, ra, ids, viaf, 'viaf')
+                author_id_found.append((viaf, 'viaf'))
+
+        # If the author doesn't have Wikidata ID
+        if not has_wikidata:
+            for literal, scheme in author_id_found:
+                res = self.wikidata_api.query(literal, scheme)
+                if res:
+                    self._stage(edits, ra, ids, res, 'wikidata', "its {} {}".format(scheme.upper(), literal))
+                    break
+
+        return edits
+
+    @staticmethod
+    def _stage(edits: list, entity: Union[BibliographicResource, ResponsibleAgent], entity_ids: list, literal: str,
+               schema: str, by_means_of: str = None) -> None:
+        """ Record an identifier to be added to an entity, keeping track of the identifiers that the entity will
+        have once `_add_id` has been called
+
+        :param edits: the list of the identifiers to be added
+        :param entity: a bibliographic resource or a responsible agent
+        :param entity_ids: the identifiers that the entity will have, as tuples <scheme, literal>
+        :param literal: the literal value of the identifier
+        :param schema: the schema of the identifier
+        :param by_means_of: an optional string that let you specify the API used
+        """
+        edits.append((entity, literal, schema, by_means_of))
+        if all(existing != literal for _, existing in entity_ids):
+            entity_ids.append((_SCHEMA_IRI[schema], literal))
+
     def _add_id(self, entity: Union[BibliographicResource, ResponsibleAgent], literal: str, schema: str,
                 by_means_of: str = None) -> None:
         """ Method that let you add a new identifier to an entity,
@@ -280,34 +603,38 @@ class GraphEnricher:
         :param by_means_of: an optional string that let you specify the API used
         """
 
-        old_identifiers = entity.get_identifiers()
-
-        # Check if the ID is already associated to the entity
-        for i in old_identifiers:
-            if i.get_literal_value() == literal:
-                if self.debug:
-                    print("Identifier {} already present".format(literal))
-                return
-
+        # Check if the ID is already associated to the entity, by means of the sets of its literals and schemes
+        # (built the first time the entity is met and then kept up to date)
+        known = self._literal_index.get(entity)
+        if known is None:
+            entity_ids = entity.get_identifiers()
+            known = ({i.get_literal_value() for i in entity_ids}, {i.get_scheme() for i in entity_ids})
+            self._literal_index[entity] = known
+        literals, schemes = known
+        if literal in literals:
+            if self.debug:
+                print("Identifier {} already present".format(literal))
+            return
+
+        # The same author may have been looked up for different BRs at the same time, each lookup finding an ID
+        scheme = _SCHEMA_IRI[schema]
+        if scheme in _SINGLE_ID_SCHEMES and scheme in schemes:
+            if self.debug:
+                print("Identifier {} skipped: an identifier of schema {} is already present".format(literal, schema))
+            return
+
+        # An unknown schema raises a KeyError before anything is added to the graph set
+        create = _ID_CREATORS[schema]
+
+        old_identifiers = entity.get_identifiers() if self.debug else None
         self.new_id_found += 1
 
         new_id = self.g_set.add_id(self.resp_agent)
-        if schema == 'issn':
-            new_id.create_issn(literal)
-        elif schema == 'doi':
-            new_id.create_doi(literal)
-        elif schema == 'orcid':
-            new_id.create_orcid(literal)
-        elif schema == 'viaf':
-            new_id.create_viaf(literal)
-        elif schema == 'crossref':
-            new_id.create_crossref(literal)
-        elif schema == 'wikidata':
-            new_id.create_wikidata(literal)
-        elif schema == 'openalex':
-            new_id.create_openalex(literal)
+        create(new_id, literal)
 
         entity.has_identifier(new_id)
+        literals.add(literal)
+        schemes.add(scheme)
 
         if self.debug:
 
@@ -0,0 +1,215 @@
+"""
+Copyright 2021 Gabriele Pisciotta - ga.pisciotta@gmail.com
+
+Permission to use, copy, modify, and/or distribute this software for any purpose with or without fee is hereby granted,
+provided that the above copyright notice and this permission notice appear in all copies.
+
+THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT,
+INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN
+AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR PERFORMANCE
+OF THIS SOFTWARE.
+"""
+
+__author__ = "Gabriele Pisciotta"
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import TestCase
+
+import requests
+from oc_ocdm.graph import GraphSet
+from oc_ocdm.reader import Reader
+from rdflib import Graph
+
+from oc_graphenricher.enricher import GraphEnricher
+
+RESP_AGENT = 'https://w3id.org/oc/meta/prov/pa/2'
+
+
+class StubCrossref:
+    """ Answer the Crossref queries of the enricher without any request """
+
+    def __init__(self, dois=None, combined=None):
+        self.dois = dois or {}
+        self.combined = combined
+        self.queried_titles = []
+
+    def query(self, authors, title, pub_date):
+        self.queried_titles.append(title)
+        return self.dois.get(title)
+
+    def query_batch(self, specs, max_workers=None):
+        return [self.dois.get(title) for _, title, _ in specs]
+
+    def query_combined(self, issns, title, pub_date):
+        return self.combined
+
+    def query_journal(self, issn):
+        return []
+
+    def query_publisher(self, doi):
+        return None
+
+    def clear_cache(self):
+        pass
+
+
+class StubORCID:
+    """ Answer the ORCID queries of the enricher without any request """
+
+    def __init__(self, orcids=None):
+        self.orcids = orcids or {}
+
+    def query(self, authors, identifiers):
+        return [(given_name, family_name, self.orcids.get((given_name, family_name)), ra)
+                for given_name, family_name, _, ra in authors]
+
+    def clear_cache(self):
+        pass
+
+
+class StubVIAF:
+    """ Answer the VIAF queries of the enricher without any request """
+
+    def __init__(self, viafs=None):
+        self.viafs = viafs or {}
+
+    def query(self, given_name, family_name, title):
+        return self.viafs.get((given_name, family_name))
+
+    def clear_cache(self):
+        pass
+
+
+class StubLookup:
+    """ Answer the Wikidata and OpenAlex queries of the enricher without any request. The lookups of the literals
+    in `slow` take a while, so that the BRs looked up concurrently don't complete in the order they're submitted """
+
+    def __init__(self, results=None, slow=()):
+        self.results = results or {}
+        self.slow = frozenset(slow)
+
+    def query(self, literal, schema):
+        if literal in self.slow:
+            time.sleep(0.2)
+        return self.results.get(literal)
+
+    def query_batch(self, literals, schema):
+        return [self.results.get(literal) for literal in literals]
+
+    def clear_cache(self):
+        pass
+
+
+class TestGraphEnricher(TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'instancematching')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.session = requests.Session()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.tmp_dir.cleanup()
+
+    def __read_graph_set(self) -> GraphSet:
+        g = Graph()
+        g = g.parse(os.path.join(self.test_dir, 'test_merge_br.rdf'), format='nt11')
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        Reader().import_entities_from_graph(g_set, g, enable_validation=False, resp_agent=RESP_AGENT)
+        return g_set
+
+    def __enricher(self, g_set: GraphSet, workers: int = 1, crossref: StubCrossref = None) -> GraphEnricher:
+        enricher = GraphEnricher(g_set,
+                                 graph_filename=os.path.join(self.tmp_dir.name, 'enriched.rdf'),
+                                 provenance_filename=os.path.join(self.tmp_dir.name, 'provenance.rdf'),
+                                 info_dir=os.path.join(self.tmp_dir.name, 'info_dir') + os.sep,
+                                 workers=workers,
+                                 session=self.session)
+        enricher.crossref_api = crossref if crossref is not None else StubCrossref()
+        enricher.orcid_api = StubORCID()
+        enricher.viaf_api = StubVIAF({('name', 'familyname'): '111', ('othername', 'otherfamilyname'): '222'})
+        # The lookups of br/3 are slower than the ones of the following BRs
+        enricher.wikidata_api = StubLookup({'doi1': 'Q1', 'doi4': 'Q4', 'orcid1': 'Q10', 'orcid_author_1': 'Q20'},
+                                           slow=('doi1',))
+        enricher.openalex_api = StubLookup({'doi1': ['W1'], 'doi4': ['W4']})
+        return enricher
+
+    @staticmethod
+    def __identifiers(g_set: GraphSet) -> dict:
+        return {str(entity.res): sorted((str(i.res), i.get_scheme().split('/')[-1], i.get_literal_value())
+                                        for i in entity.get_identifiers())
+                for entity in list(g_set.get_br()) + list(g_set.get_ra())}
+
+    def __enrich(self, workers: int) -> dict:
+        g_set = self.__read_graph_set()
+        self.__enricher(g_set, workers).enrich()
+        return self.__identifiers(g_set)
+
+    def test_enrich(self):
+        identifiers = {entity: sorted((scheme, literal) for _, scheme, literal in ids)
+                       for entity, ids in self.__enrich(workers=1).items()}
+        expected = {
+            'http://example.com/br/3': [('doi', 'doi1'), ('openalex', 'W1'), ('wikidata', 'Q1')],
+            'http://example.com/br/6': [('doi', 'doi1'), ('openalex', 'W1'), ('wikidata', 'Q1')],
+            'http://example.com/br/7': [('doi', 'doi4'), ('openalex', 'W4'), ('wikidata', 'Q4')],
+            'http://example.com/ra/1': [('orcid', 'orcid1'), ('viaf', '111'), ('wikidata', 'Q10')],
+            'http://example.com/ra/3': [('orcid', 'orcid1'), ('viaf', '111'), ('wikidata', 'Q10')],
+            'http://example.com/ra/5': [('orcid', 'orcid_author_1'), ('viaf', '222'), ('wikidata', 'Q20')],
+            'http://example.com/ra/6': [('orcid', 'orcid_author_1'), ('viaf', 'viaf1'), ('wikidata', 'Q20')],
+            # Issues, volumes and publishers with a Crossref ID are left as they are
+            'http://example.com/br/1': [('doi', 'br3_volume_doi')],
+            'http://example.com/br/2': [('doi', 'br3_issue_doi')],
+            'http://example.com/br/4': [('doi', 'br6_volume_doi')],
+            'http://example.com/br/5': [('doi', 'br6_issue_doi')],
+            'http://example.com/ra/2': [('crossref', 'pub1')],
+            'http://example.com/ra/4': [('crossref', 'pub1')]
+        }
+        if identifiers != expected:
+            self.fail()
+
+    def test_enrich_independent_of_workers(self):
+        # Also the IRIs of the new identifiers must be the same
+        if self.__enrich(workers=1) != self.__enrich(workers=8):
+            self.fail()
+
+    def test_doi_searched_among_all_works(self):
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        br = g_set.add_br(RESP_AGENT)
+        br.create_journal_article()
+        br.has_title("A work missing from the ISSN search")
+        issn = g_set.add_id(RESP_AGENT)
+        issn.create_issn("1234-5678")
+        br.has_identifier(issn)
+
+        # The DOI isn't found among the works published with the ISSN, but among all the works
+        crossref = StubCrossref(dois={"A work missing from the ISSN search": "10.1000/182"},
+                                combined={'issns': [], 'doi': None})
+        self.__enricher(g_set, crossref=crossref).enrich()
+        literals = [i.get_literal_value() for i in br.get_identifiers()]
+        if "10.1000/182" not in literals or crossref.queried_titles != ["A work missing from the ISSN search"]:
+            self.fail()
+
+    def test_single_id_per_scheme(self):
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        ra = g_set.add_ra(RESP_AGENT)
+        enricher = self.__enricher(g_set)
+
+        # An author looked up for two BRs at the same time may be given two different IDs of the same scheme
+        for schema, first, second in (('orcid', '0000-0001-2345-6789', '0000-0002-2345-6789'),
+                                      ('viaf', '111', '222'),
+                                      ('wikidata', 'Q1', 'Q2')):
+            enricher._add_id(ra, first, schema)
+            enricher._add_id(ra, second, schema)
+            enricher._add_id(ra, first, schema)
+        literals = sorted(i.get_literal_value() for i in ra.get_identifiers())
+        if literals != ['0000-0001-2345-6789', '111', 'Q1'] or enricher.new_id_found != 3:
+            self.fail()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,16 +13,93 @@ OF THIS SOFTWARE.
 
 __author__ = "Gabriele Pisciotta"
 
-import Levenshtein
-import networkx as nx
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
 from oc_ocdm import Storer
 from oc_ocdm.graph import GraphSet
 from oc_ocdm.graph.entities.bibliographic.bibliographic_resource import BibliographicResource
 from oc_ocdm.graph.entities.bibliographic.responsible_agent import ResponsibleAgent
 from oc_ocdm.graph.graph_entity import GraphEntity
 from oc_ocdm.prov import ProvSet
+from rapidfuzz import fuzz, process
 from rdflib import URIRef
 
+log = logging.getLogger(__name__)
+
+# The type shared by all the Bibliographic Resources (BRs), which is not considered to match their containers
+_FABIO_EXPRESSION = URIRef('http://purl.org/spar/fabio/Expression')
+
+# What's read once of an author of a Bibliographic Resource (BR): its Agent Role (AR), the Responsible Agent (RA) that
+# holds it, and the full name of the RA ("" if unknown)
+_ARInfo = namedtuple('_ARInfo', 'ar ra name')
+
+
+def _container_types(br: BibliographicResource) -> frozenset:
+    """ Return the types of a Bibliographic Resource (BR) that tell which kind of container it is (e.g. journal,
+    volume, issue). They are read every time, since merging two containers changes the types of the first one
+
+    :param br: a Bibliographic Resource (BR)
+    :return: the types of the BR, but the generic fabio:Expression
+    """
+    return frozenset(br.get_types()) - {_FABIO_EXPRESSION}
+
+
+class _DisjointSet:
+    """
+    A disjoint-set (union-find) of entities, used to group the entities linked, directly or not, by identifiers in
+    common. Each entity is given an integer index, so that the structure is made only of lists
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._entities = []
+        self._parent = []
+        self._rank = []
+
+    def __add(self, entity) -> int:
+        n = self._index.get(entity)
+        if n is None:
+            n = len(self._entities)
+            self._index[entity] = n
+            self._entities.append(entity)
+            self._parent.append(n)
+            self._rank.append(0)
+        return n
+
+    def __find(self, n: int) -> int:
+        parent = self._parent
+        while parent[n] != n:
+            # Path halving: every other node on the path is linked to its grandparent
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    def union(self, entity_a, entity_b) -> None:
+        """ Put two entities in the same group, adding them if they aren't already in the structure """
+        root_a = self.__find(self.__add(entity_a))
+        root_b = self.__find(self.__add(entity_b))
+        if root_a == root_b:
+            return
+        if self._rank[root_a] < self._rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        if self._rank[root_a] == self._rank[root_b]:
+            self._rank[root_a] += 1
+
+    def groups(self) -> list:
+        """
+        Return the groups of entities, ordered by the first entity added of each group
+
+        :return: a list of sets of entities
+        """
+        groups = {}
+        for n, entity in enumerate(self._entities):
+            groups.setdefault(self.__find(n), set()).add(entity)
+        return list(groups.values())
+
 
 class InstanceMatching:
     """
@@ -36,7 +113,9 @@ class InstanceMatching:
                  graph_filename="matched.rdf",
                  provenance_filename="provenance.rdf",
                  info_dir: str = "",
-                 debug=False):
+                 debug=False,
+                 br_min_shared_ids: int = 1,
+                 br_trusted_schemes: tuple = (GraphEntity.iri_doi, GraphEntity.iri_pmid, GraphEntity.iri_pmcid)):
         """
 
         :param g_set: input graph set
@@ -44,12 +123,24 @@ class InstanceMatching:
         :param provenance_filename: file name of the provenance that will be serialized
         :param info_dir: the path to the counters directory
         :param debug: a bool flag to enable richer output
+        :param br_min_shared_ids: the number of identifiers that two Bibliographic Resources (BRs) must have in
+        common to be merged, unless one of them has a trusted scheme (by default, one is enough)
+        :param br_trusted_schemes: the schemes of the identifiers that are enough, alone, to merge two Bibliographic
+        Resources (BRs)
         """
 
         self.g_set = g_set
         self.graph_filename = graph_filename
         self.provenance_filename = provenance_filename
         self.debug = debug
+        self.br_min_shared_ids = br_min_shared_ids
+        self.br_trusted_schemes = frozenset(br_trusted_schemes)
+        # The Agent Roles (ARs) of each Responsible Agent (RA) and the role of each AR, read once for all the matching
+        self._ar_by_ra = None
+        self._ar_role = None
+        # The identifiers of each Bibliographic Resource (BR) and Responsible Agent (RA), read once for all the
+        # matching and kept up to date when an entity is merged into another one
+        self._identifiers = None
         self.prov = ProvSet(self.g_set, self.g_set.base_iri, info_dir=info_dir)
 
     def match(self):
@@ -62,6 +153,8 @@ class InstanceMatching:
             - `matched.rdf` that will contain the graph set specified previously without the duplicates.
             - `provenance.rdf` that will contain the provenance, tracking record of all the changes done.
         """
+        self.__build_indexes()
+        self.__build_identifier_index()
         self.instance_matching_ra()
         self.instance_matching_br()
         self.instance_matching_id()
@@ -73,10 +166,14 @@ class InstanceMatching:
         and the provenance in another specified RDF file.
         """
         gs_storer = Storer(self.g_set, output_format="nt11")
-        gs_storer.store_graphs_in_file(self.graph_filename, "")
-
         prov_storer = Storer(self.prov, output_format="nquads")
-        prov_storer.store_graphs_in_file(self.provenance_filename, "")
+
+        # The graph set and the provenance are independent, so they are written at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            stored = [executor.submit(gs_storer.store_graphs_in_file, self.graph_filename, ""),
+                      executor.submit(prov_storer.store_graphs_in_file, self.provenance_filename, "")]
+        for future in stored:
+            future.result()
 
     def instance_matching_ra(self):
         """ Discover all the Responsible Agents (RAs)  that share the same identifier's literal, creating a graph of
@@ -91,63 +188,59 @@ class InstanceMatching:
 
         In the end, generate the provenance and commit pending changes in the graph set"""
 
-        merge_graph: nx.Graph = nx.Graph()
+        merge_graph = _DisjointSet()
 
-        associated_ar_ra = self.__get_association_ar_ra()
+        if self._ar_by_ra is None:
+            self.__build_indexes()
+        associated_ar_ra = self._ar_by_ra
+        if self._identifiers is None:
+            self.__build_identifier_index()
         identifiers = {}
-        for ra in self.g_set.get_ra():
-            for i in ra.get_identifiers():
-                if identifiers.get(i.get_scheme()) is None:
-                    identifiers[i.get_scheme()] = {}
-
-                ra_first: ResponsibleAgent = identifiers[i.get_scheme()].get(i.get_literal_value())
-                if ra_first is None:
-                    identifiers[i.get_scheme()][i.get_literal_value()] = ra
-                else:
-                    merge_graph.add_edge(ra_first, ra)
+        for ra, ra_identifiers in self._identifiers.items():
+            if not isinstance(ra, ResponsibleAgent):
+                continue
+            for scheme, literal, _ in ra_identifiers:
+                ra_first: ResponsibleAgent = identifiers.setdefault((scheme, literal), ra)
+                if ra_first is not ra:
+                    merge_graph.union(ra_first, ra)
                     if self.debug:
                         print("[IM-RA] Will merge {} and {} due to {}:{} in common".format(ra.res,
                                                                                            ra_first.res,
-                                                                                           i.get_scheme().split(
-                                                                                               "/")[-1],
-                                                                                           i.get_literal_value()))
-        # Get the connected components of the graph (clusters of "to-be-merged"):
-        clusters = sorted(nx.connected_components(merge_graph), key=len, reverse=True)
-        print("[IM-RA] N° of clusters: {}".format(len(clusters)))
+                                                                                           scheme.split("/")[-1],
+                                                                                           literal))
+
+        # Get the groups of entities linked by identifiers in common (clusters of "to-be-merged"):
+        clusters = sorted(merge_graph.groups(), key=len, reverse=True)
+        log.info("[IM-RA] N° of clusters: %d", len(clusters))
 
         for n, cluster in enumerate(clusters):
-            clusters_dict = {}
-            clusters_str_list = []
-            for k in cluster:
-                clusters_dict[str(k)] = k
-                clusters_str_list.append(str(k))
-            clusters_str_list.sort()
-
-            entity_first: ResponsibleAgent = clusters_dict[clusters_str_list[0]]
+            # The entities are sorted by IRI, so that the first one, in which the others are merged, is always the same
+            ordered = sorted(cluster, key=lambda e: str(e.res))
+
+            entity_first: ResponsibleAgent = ordered[0]
             if self.debug:
                 print("[IM-RA] Merging cluster #{}, with {} entities".format(n, len(cluster)))
 
-            for entity in clusters_str_list[1:]:
-                other_entity = clusters_dict[entity]
+            for other_entity in ordered[1:]:
                 if self.debug:
-                    print(f"\tMerging responsible agent {entity} in responsible agent {entity_first}")
+                    print(f"\tMerging responsible agent {other_entity} in responsible agent {entity_first}")
 
-                # The other entity has been merged in the first entity: at this point we need to change all the
-                # occurrencies of the other entity with the first entity by looking at all the ARs referred
+                # The other entity is merged in the first entity: merging redirects all the triples that point to
+                # the other entity, so all the ARs referring to it are already set to the first entity
                 #
                 # in the scenario in which:
                 #  AR1-> RA1
                 #  AR2-> RA2
                 #  and RA1==RA2
                 #
-                #  so we do RA1.merge(RA2) and in the end set AR2-> RA1
-                entity_first.merge(other_entity)
+                #  RA1.merge(RA2) sets AR2-> RA1, and only the index of the ARs of each RA is updated here
+                self.__merge(entity_first, other_entity)
                 if associated_ar_ra.get(other_entity) is not None:
-                    for ar in associated_ar_ra.get(other_entity):
-                        ar.is_held_by(entity_first)
-                        if self.debug:
+                    if self.debug:
+                        for ar in associated_ar_ra.get(other_entity):
                             print(f"\tUnset {other_entity} as helded by of {ar}")
                             print(f"\tSet {entity_first} as helded by of {ar} ")
+                    associated_ar_ra.setdefault(entity_first, []).extend(associated_ar_ra.pop(other_entity))
 
                 if self.debug:
                     print(f"\tMarking to delete: {other_entity} ")
@@ -165,184 +258,239 @@ class InstanceMatching:
             - their publisher
 
         In the end, generate the provenance and commit pending changes in the graph set"""
-        merge_graph: nx.Graph = nx.Graph()
-
+        merge_graph = _DisjointSet()
+
+        # Each pair of Bibliographic Resources (BRs) sharing an identifier is weighted by the number of identifiers
+        # in common: only the pairs sharing enough identifiers, or at least one with a trusted scheme, are merged.
+        # With the default of one identifier, each BR is merged directly into the first one with the same identifier
+        if self._identifiers is None:
+            self.__build_identifier_index()
+        count_pairs = self.br_min_shared_ids > 1
         identifiers = {}
-        for br in self.g_set.get_br():
+        # The identifiers shared by each pair of BRs, as strings "<schema>:<literal>"
+        pair_shared = {}
+        pair_trusted = set()
+        for br, br_identifiers in self._identifiers.items():
+            if not isinstance(br, BibliographicResource):
+                continue
+            for scheme, literal, _ in br_identifiers:
+                holders = identifiers.setdefault((scheme, literal), [])
+                # The same identifier may be listed twice for the same BR
+                if holders and holders[-1] is br:
+                    continue
+                if holders:
+                    shared = "{}:{}".format(scheme.split("/")[-1], literal) if count_pairs or self.debug else None
+                    if count_pairs:
+                        # The BRs are always met in the same order, so each pair is keyed in the same way
+                        for other in holders:
+                            pair = (other, br)
+                            pair_shared.setdefault(pair, []).append(shared)
+                            if scheme in self.br_trusted_schemes:
+                                pair_trusted.add(pair)
+                    else:
+                        merge_graph.union(holders[0], br)
+                        if self.debug:
+                            print("[IM-BR] Will merge {} into {} due to {} in common".format(br.res, holders[0].res,
+                                                                                            shared))
+                holders.append(br)
 
-            for i in br.get_identifiers():
-                if identifiers.get(i.get_scheme()) is None:
-                    identifiers[i.get_scheme()] = {}
+        for pair, shared in pair_shared.items():
+            if len(shared) >= self.br_min_shared_ids or pair in pair_trusted:
+                merge_graph.union(*pair)
+                if self.debug:
+                    print("[IM-BR] Will merge {} into {} due to {} in common".format(pair[1].res, pair[0].res,
+                                                                                    ", ".join(shared)))
+            elif self.debug:
+                print("[IM-BR] Won't merge {} into {}: only {} identifiers in common, "
+                      "none of them with a trusted scheme".format(pair[1].res, pair[0].res, len(shared)))
+
+        # Get the groups of entities linked by identifiers in common (clusters of "to-be-merge"):
+        clusters = sorted(merge_graph.groups(), key=len, reverse=True)
+        log.info("[IM-BR] N° of clusters: %d", len(clusters))
+
+        # The clusters are merged one after the other: merging two entities rewrites the triples pointing to them
+        # anywhere in the graph set, and different clusters may share the same containers and publishers
+        for n, cluster in enumerate(clusters):
+            self.__merge_br_cluster(n, cluster)
 
-                br_first: BibliographicResource = identifiers[i.get_scheme()].get(i.get_literal_value())
-                if br_first is None:
-                    identifiers[i.get_scheme()][i.get_literal_value()] = br
-                else:
-                    merge_graph.add_edge(br_first, br)
-                    if self.debug:
-                        print("[IM-BR] Will merge {} into {} due to {}:{} in common".format(br.res,
-                                                                                            br_first.res,
-                                                                                            i.get_scheme().split("/")[
-                                                                                                -1],
-                                                                                            i.get_literal_value()))
+        # Some Agent Roles (ARs) have been merged: the AR indexes are read again if another matching is done
+        self._ar_by_ra = None
+        self._ar_role = None
+        self.prov.generate_provenance()
+        self.g_set.commit_changes()
 
-        # Get the connected components of the graph (clusters of "to-be-merge"):
-        clusters = sorted(nx.connected_components(merge_graph), key=len, reverse=True)
-        print("[IM-BR] N° of clusters: {}".format(len(clusters)))
+    def __merge_br_cluster(self, n: int, cluster: set):
+        """ Merge a cluster of Bibliographic Resources (BRs) into the first one, by IRI, merging also their containers
+        and publishers, and deduplicating their authors
 
-        for n, cluster in enumerate(clusters):
-            clusters_dict = {}
-            clusters_str_list = []
-            for k in cluster:
-                clusters_dict[str(k)] = k
-                clusters_str_list.append(str(k))
-            clusters_str_list.sort()
-
-            entity_first: BibliographicResource = clusters_dict[clusters_str_list[0]]
-            publisher_first: ResponsibleAgent = self.__get_publisher(entity_first)
-            entity_first_partofs = self.__get_part_of(entity_first)
-            if self.debug:
-                print("[IM-BR] Merging cluster #{}, with {} entities".format(n, len(cluster)))
-
-            entity: BibliographicResource
-            for entity in clusters_str_list[1:]:
-                entity = clusters_dict[entity]
-
-                # Merge containers
-                partofs = self.__get_part_of(entity)
-                p1: BibliographicResource
-                p2: BibliographicResource
-                for p1 in entity_first_partofs:
-                    p1types = p1.get_types()
-                    p1types.remove(URIRef('http://purl.org/spar/fabio/Expression'))
-                    for p2 in partofs:
-                        p2types = p2.get_types()
-                        p2types.remove(URIRef('http://purl.org/spar/fabio/Expression'))
-                        intersection_of_types = set(p2types).intersection(set(p1types))
-                        if intersection_of_types is not None and len(intersection_of_types) != 0:
-                            p1.merge(p2)
-                            if self.debug:
-                                print(f"\tMerging container {p2} in container {p1} ({intersection_of_types})")
-
-                # Merge publisher
-                publisher = self.__get_publisher(entity)
-                if publisher is not None and publisher_first is not None and publisher != publisher_first:
-                    publisher_first.merge(publisher)
+        :param n: the number of the cluster, used in the debug output
+        :param cluster: the set of Bibliographic Resources (BRs) to merge
+        """
+        if len(cluster) < 2:
+            return
+
+        # The entities are sorted by IRI, so that the first one, in which the others are merged, is always the same
+        ordered = sorted(cluster, key=lambda e: str(e.res))
+
+        entity_first: BibliographicResource = ordered[0]
+        publisher_first: ResponsibleAgent = self.__get_publisher(entity_first)
+        entity_first_partofs = self.__get_part_of(entity_first)
+        if self.debug:
+            print("[IM-BR] Merging cluster #{}, with {} entities".format(n, len(cluster)))
+
+        entity: BibliographicResource
+        for entity in ordered[1:]:
+
+            # Merge containers
+            partofs = [(p2, _container_types(p2)) for p2 in self.__get_part_of(entity)]
+            p1: BibliographicResource
+            p2: BibliographicResource
+            for p1 in entity_first_partofs:
+                p1types = _container_types(p1)
+                for p2, p2types in partofs:
+                    if not p1types.isdisjoint(p2types):
+                        self.__merge(p1, p2)
+                        if self.debug:
+                            print(f"\tMerging container {p2} in container {p1} ({set(p1types & p2types)})")
+
+            # Merge publisher
+            publisher = self.__get_publisher(entity)
+            if publisher is not None and publisher_first is not None and publisher != publisher_first:
+                publisher_first.merge(publisher)
+                if self.debug:
+                    print(f"\tMerging publisher {publisher} in publisher {publisher_first}")
+
+            # Merging the two Bibliographic Resources (BRs)
+            self.__merge(entity_first, entity)
+
+            # Get only the authors, reading once the Responsible Agent (RA) of each of them and its name. The Agent
+            # Roles (ARs) are sorted, so that the one kept when two of them are merged doesn't depend on the order
+            # of the contributors
+            infos = []
+            for ar in sorted(self.__get_authors(entity_first), key=str):
+                ra = ar.get_is_held_by()
+                ar_name = ""
+                if ra is not None:
+                    given_name = ra.get_given_name()
+                    family_name = ra.get_family_name()
+                    if given_name is not None:
+                        ar_name += given_name + " "
+
+                    if family_name is not None:
+                        ar_name += family_name
+                infos.append(_ARInfo(ar, ra, ar_name))
+
+            # Dedupe by same RA: the Agent Roles (ARs) that point to the same RA are grouped, and all of them are
+            # merged into the first one of the group (we assume that the deduplication of the RA's been done)
+            groups = {}
+            for info in infos:
+                if info.ra is not None:
+                    groups.setdefault(info.ra, []).append(info.ar)
+
+            already_merged = set()
+            for group in groups.values():
+                if len(group) < 2:
+                    continue
+                ar1 = group[0]
+                for ar2 in group[1:]:
                     if self.debug:
-                        print(f"\tMerging publisher {publisher} in publisher {publisher_first}")
-
-                # Merging the two Bibliographic Resources (BRs)
-                entity_first.merge(entity)
-
-                # Get only the authors
-                contributors = entity_first.get_contributors()
-                contributors = [x for x in contributors if x.get_role_type() != GraphEntity.iri_publisher]
-
-                # Dedupe by same RA
-                already_merged = set()
-                for ar1 in contributors:
-                    for ar2 in contributors:
-                        if ar1 != ar2:
-
-                            # If these two Agent Role (AR) point to the same RA, merge
-                            # (we assume that the deduplication of the RA's been done)
-                            if ar1.get_is_held_by() is not None and ar2.get_is_held_by() is not None and \
-                                    ar1.get_is_held_by() == ar2.get_is_held_by():
-                                if self.debug:
-                                    print(f"\tRemoving agent role {ar2} from bibliographic resource {entity_first}"
-                                          f" due to the fact that's been merged to because they point"
-                                          f" both to the same Responsible Agent (RA)")
-                                ar1.merge(ar2)
-                                entity_first.remove_contributor(ar2)
-                                already_merged.add(ar1)
-                                already_merged.add(ar2)
-
-                contributors = set(entity_first.get_contributors())
-                contributors = [x for x in contributors if x.get_role_type() != GraphEntity.iri_publisher]
-                contributors = set(contributors)
-                contributors = contributors.difference(already_merged)
-
-                for ar1 in contributors:
-                    ar1_name = ""
-                    if ar1.get_is_held_by() is not None and ar1.get_is_held_by().get_given_name() is not None:
-                        ar1_name += ar1.get_is_held_by().get_given_name() + " "
-
-                    if ar1.get_is_held_by() is not None and ar1.get_is_held_by().get_family_name() is not None:
-                        ar1_name += ar1.get_is_held_by().get_family_name()
-
-                    for ar2 in contributors:
-                        ar2_name = ""
-                        if ar2.get_is_held_by() is not None and ar2.get_is_held_by().get_given_name() is not None:
-                            ar2_name += ar2.get_is_held_by().get_given_name() + " "
-
-                        if ar2.get_is_held_by() is not None and ar2.get_is_held_by().get_family_name() is not None:
-                            ar2_name += ar2.get_is_held_by().get_family_name()
-
-                        name_similarity = 1 - Levenshtein.distance(ar1_name, ar2_name)
-                        if ar1_name != "" and ar2_name != "" and name_similarity > 0.95:
-                            ar1.merge(ar2)
-                            entity_first.remove_contributor(ar2)
-                            if self.debug:
-                                print(f"\tRemoving agent role {ar2} from bibliographic resource {entity_first}"
-                                      f" due to the fact that's been merged to {ar1} because their name"
-                                      f" has a similarity of {name_similarity} > 0.95")
-
-                # Remove contributors without RA
-                contributors = set(entity_first.get_contributors())
-                contributors = [x for x in contributors if x.get_role_type() != GraphEntity.iri_publisher]
-
-                for ar in contributors:
-                    if ar.get_is_held_by() is None:
-                        entity_first.remove_contributor(ar)
+                        print(f"\tRemoving agent role {ar2} from bibliographic resource {entity_first}"
+                              f" due to the fact that's been merged to {ar1} because they point"
+                              f" both to the same Responsible Agent (RA)")
+                    ar1.merge(ar2)
+                    entity_first.remove_contributor(ar2)
+                already_merged.update(group)
+
+            # Each name is compared at once with the ones that follow it: only the pairs similar enough are
+            # returned. The Agent Roles (ARs) merged above, or already merged into another one, are not compared
+            remaining = [info for info in infos if info.ar not in already_merged]
+            merged = set()
+            for n1, info1 in enumerate(remaining):
+                if n1 in merged or info1.name == "":
+                    continue
+
+                choices = {n2: remaining[n2].name for n2 in range(n1 + 1, len(remaining))
+                           if n2 not in merged and remaining[n2].name != ""}
+                for _, score, n2 in process.extract(info1.name, choices, scorer=fuzz.ratio,
+                                                    score_cutoff=95, limit=None):
+                    name_similarity = score / 100
+                    ar1 = info1.ar
+                    ar2 = remaining[n2].ar
+                    ar1.merge(ar2)
+                    entity_first.remove_contributor(ar2)
+                    merged.add(n2)
+                    if self.debug:
+                        print(f"\tRemoving agent role {ar2} from bibliographic resource {entity_first}"
+                              f" due to the fact that's been merged to {ar1} because their name"
+                              f" has a similarity of {name_similarity} >= 0.95")
 
-        self.prov.generate_provenance()
-        self.g_set.commit_changes()
+            # Remove contributors without RA (they have been neither merged nor removed above)
+            for info in infos:
+                if info.ra is None:
+                    entity_first.remove_contributor(info.ar)
 
     def instance_matching_id(self):
         """ Discover all the IDs related to Bibliographic Resources (BRs) and Responsible Agents (RAs) that share the
          same schema and literal, then merge all into one and substitute all the reference with the merged one.
          In the end, generate the provenance and commit pending changes in the graph set"""
+        # Only the (scheme, literal) pairs of more IDs are listed, from the second ID found: most IDs are unique
+        first_id = {}
         literal_to_id = {}
-        id_to_resources = {}
-
-        entities = list(self.g_set.get_br())
-        entities.extend(list(self.g_set.get_ra()))
-
-        for e in entities:
-            for i in e.get_identifiers():
-                literal = i.get_scheme() + "#" + i.get_literal_value()
-                if i in id_to_resources:
-                    id_to_resources[i].append(e)
-                else:
-                    id_to_resources[i] = [e]
-
-                if literal in literal_to_id:
-                    literal_to_id[literal].append(i)
-                else:
-                    literal_to_id[literal] = [i]
+        seen = set()
+
+        if self._identifiers is None:
+            self.__build_identifier_index()
+        for e_identifiers in self._identifiers.values():
+            for scheme, literal, i in e_identifiers:
+                # An ID shared by more entities is listed once, so that it's never merged into itself
+                if i in seen:
+                    continue
+                seen.add(i)
+                key = (scheme, literal)
+                i_first = first_id.setdefault(key, i)
+                if i_first is not i:
+                    literal_to_id.setdefault(key, [i_first]).append(i)
 
         for k, v in literal_to_id.items():
-            if len(v) > 1:
-                schema, lit = k.split('#')
-                print(
-                    f"[IM-ID] Will merge {len(v) - 1} identifiers into {v[0]} because "
-                    f"they share literal {lit} and schema {schema}")
-                for actual_id in v[1:]:
-                    v[0].merge(actual_id)
-                    entities = id_to_resources[actual_id]
-
-                    # Remove, from all the entities, the ID that has been merged
-                    # Setting, instead, the merged one as new ID
-                    for e in entities:
-                        e.remove_identifier(actual_id)
-                        if v[0] not in e.get_identifiers():
-                            e.has_identifier(v[0])
-
-                    actual_id.mark_as_to_be_deleted()
-
+            schema, lit = k
+            log.info("[IM-ID] Will merge %d identifiers into %s because they share literal %s and schema %s",
+                     len(v) - 1, v[0], lit, schema)
+            # Merging an ID already replaces it with the merged one in all the entities that refer to it, and marks
+            # it as to be deleted
+            for actual_id in v[1:]:
+                v[0].merge(actual_id)
+
+        # The identifiers of the entities have changed: the index is read again if another matching is done
+        self._identifiers = None
         self.prov.generate_provenance()
         self.g_set.commit_changes()
 
+    def __merge(self, entity_first, other_entity):
+        """ Merge an entity into another one, updating the identifier index: the merged entity is removed from it,
+        and the identifiers of the entity it's been merged into are read again (when merged, the identifiers that
+        share scheme and literal are deduplicated). An entity is never merged into itself (e.g. a container shared by
+        two Bibliographic Resources), since it would be marked as to be deleted
+
+        :param entity_first: the entity that will be kept
+        :param other_entity: the entity that will be merged into the first one
+        """
+        if entity_first is other_entity:
+            return
+        entity_first.merge(other_entity)
+        if self._identifiers is not None and self._identifiers.pop(other_entity, None) is not None:
+            self._identifiers[entity_first] = [(i.get_scheme(), i.get_literal_value(), i)
+                                               for i in entity_first.get_identifiers()]
+
+    def __build_identifier_index(self):
+        """
+        Read, with a single pass over all the Bibliographic Resources (BRs) and the Responsible Agents (RAs), the
+        scheme, the literal and the entity of each of their identifiers. The BRs come first, then the RAs
+        """
+        index = {}
+        for e in chain(self.g_set.get_br(), self.g_set.get_ra()):
+            index[e] = [(i.get_scheme(), i.get_literal_value(), i) for i in e.get_identifiers()]
+        self._identifiers = index
+
     @staticmethod
     def __get_part_of(br: BibliographicResource):
         """ Given a Bibliographic Resource (BR) in input (e.g.: a journal article), walk the full 'part-of' chain.
@@ -353,50 +501,50 @@ class InstanceMatching:
         :return partofs: a list that contains the Bibliographic Resources (BRs) of the hierarchy
         """
         partofs = []
-        e = br
-        ended = False
-        while not ended:
-            partof = e.get_is_part_of()
-            if partof is not None:
-                partofs.append(partof)
-                e = partof
-            else:
-                ended = True
+        # A malformed chain may contain a cycle: the walk stops at the first container already seen
+        seen = {br}
+        partof = br.get_is_part_of()
+        while partof is not None and partof not in seen:
+            partofs.append(partof)
+            seen.add(partof)
+            partof = partof.get_is_part_of()
         return partofs
 
-    @staticmethod
-    def __get_publisher(br):
+    def __get_publisher(self, br):
         """ Given a Bibliographic Resource (BR) as input, returns the Agent Role (AR) that is a publisher """
+        get_role = self.__get_role
+        iri_publisher = GraphEntity.iri_publisher
         for ar in br.get_contributors():
-            role = ar.get_role_type()
-            if role == GraphEntity.iri_publisher:
+            if get_role(ar) == iri_publisher:
                 return ar
 
-    def __get_association_ar_ra(self):
-        """
-        This let you take all the ARs associated to the same RA
-
-        :return association: a dictionary having Responsible Agent (RA) as key, and a list of Agent Role (AR) as value
-        """
-        association = {}
-        for ar in self.g_set.get_ar():
-            if ar.get_is_held_by() is not None and ar.get_is_held_by() not in association:
-                association[ar.get_is_held_by()] = [ar]
-            elif ar.get_is_held_by() is not None and ar.get_is_held_by() in association:
-                association[ar.get_is_held_by()].append(ar)
-        return association
+    def __get_authors(self, br):
+        """ Given a Bibliographic Resource (BR) as input, returns the Agent Roles (ARs) that are not publishers """
+        get_role = self.__get_role
+        iri_publisher = GraphEntity.iri_publisher
+        return [ar for ar in br.get_contributors() if get_role(ar) != iri_publisher]
+
+    def __get_role(self, ar):
+        """ Given an Agent Role (AR) as input, returns its role, as read when the indexes have been built """
+        if self._ar_role is None:
+            self.__build_indexes()
+        role = self._ar_role.get(ar)
+        if role is None:
+            role = ar.get_role_type()
+        return role
 
-    def __get_association_ar_br(self):
+    def __build_indexes(self):
         """
-        This let you take all the Bibliographic Resources (BRs)  associated to the same AR
-
-        :return association: a dictionary having Agent Role (AR) as key, and a list of Bibliographic Resource (BR) as value
+        Read, with a single pass over all the Agent Roles (ARs), the ARs associated to each Responsible Agent (RA)
+        and the role of each AR. The roles don't change during the matching, while the ARs associated to each RA
+        are kept up to date by the matching of the Responsible Agents (RAs)
         """
-        association = {}
-        for br in self.g_set.get_br():
-            for ar in br.get_contributors():
-                if ar.get_is_held_by() is not None and ar not in association:
-                    association[ar] = [br]
-                elif ar.get_is_held_by() is not None and ar in association:
-                    association[ar].append(br)
-        return association
+        ar_by_ra = {}
+        ar_role = {}
+        for ar in self.g_set.get_ar():
+            ar_role[ar] = ar.get_role_type()
+            ra = ar.get_is_held_by()
+            if ra is not None:
+                ar_by_ra.setdefault(ra, []).append(ar)
+        self._ar_by_ra = ar_by_ra
+        self._ar_role = ar_role
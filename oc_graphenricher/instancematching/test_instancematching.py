@@ -18,6 +18,7 @@ import unittest
 from unittest import TestCase
 
 from oc_ocdm.graph import GraphSet
+from oc_ocdm.graph.graph_entity import GraphEntity
 from oc_ocdm.reader import Reader
 from rdflib import Graph
 
@@ -118,6 +119,76 @@ class TestInstanceMatching(TestCase):
                 print(f"Contributors len {len(br.get_contributors())}")
                 self.fail()
 
+    def test_brs_keep_one_author_per_ra(self):
+        for br in self.g_set_new.get_br():
+            if str(br) == 'http://example.com/br/3':
+                authors = [ar for ar in br.get_contributors() if ar.get_role_type() != GraphEntity.iri_publisher]
+                if len(authors) != 1 or str(authors[0].get_is_held_by()) != 'http://example.com/ra/1':
+                    self.fail()
+
+    def test_brs_not_merged_without_enough_ids(self):
+        g = Graph()
+        g = g.parse(self.test_dir + 'test_merge_br.rdf', format='nt11')
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        Reader().import_entities_from_graph(g_set,
+                                            g,
+                                            enable_validation=False,
+                                            resp_agent='https://w3id.org/oc/meta/prov/pa/2')
+
+        # br/3 and br/6 share only their DOI, which is not trusted here
+        matcher = InstanceMatching(g_set, br_min_shared_ids=2, br_trusted_schemes=())
+        matcher.instance_matching_br()
+        brs = {str(br): br for br in g_set.get_br()}
+        br_3, br_6 = brs['http://example.com/br/3'], brs['http://example.com/br/6']
+        if len(br_3.g) == 0 or len(br_6.g) == 0 or len(br_6.get_contributors()) == 0:
+            self.fail()
+        ids_3, ids_6 = br_3.get_identifiers(), br_6.get_identifiers()
+        if [i.get_literal_value() for i in ids_3] != ['doi1'] or [i.get_literal_value() for i in ids_6] != ['doi1'] \
+                or ids_3[0] is ids_6[0]:
+            self.fail()
+
+    def test_brs_merged_when_sharing_enough_ids_with_any_holder(self):
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        resp_agent = 'https://w3id.org/oc/meta/prov/pa/2'
+        brs = []
+        for issn, isbn in (('1234-5678', None), ('1234-5678', '9780306406157'), ('1234-5678', '9780306406157')):
+            br = g_set.add_br(resp_agent)
+            id_issn = g_set.add_id(resp_agent)
+            id_issn.create_issn(issn)
+            br.has_identifier(id_issn)
+            if isbn is not None:
+                id_isbn = g_set.add_id(resp_agent)
+                id_isbn.create_isbn(isbn)
+                br.has_identifier(id_isbn)
+            brs.append(br)
+
+        # The second and the third BR share two identifiers, even if the ISSN was first met on the first BR
+        matcher = InstanceMatching(g_set, br_min_shared_ids=2, br_trusted_schemes=())
+        matcher.instance_matching_br()
+        if len(brs[0].g) == 0 or len(brs[1].g) == 0 or len(brs[2].g) != 0:
+            self.fail()
+
+    def test_shared_container_kept(self):
+        g_set = GraphSet(base_iri='https://w3id.org/oc/meta/')
+        resp_agent = 'https://w3id.org/oc/meta/prov/pa/2'
+        journal = g_set.add_br(resp_agent)
+        journal.create_journal()
+        brs = []
+        for _ in range(2):
+            br = g_set.add_br(resp_agent)
+            br.create_journal_article()
+            br.is_part_of(journal)
+            doi = g_set.add_id(resp_agent)
+            doi.create_doi('10.1000/182')
+            br.has_identifier(doi)
+            brs.append(br)
+
+        # Both the BRs are part of the same journal, which must not be merged into itself
+        matcher = InstanceMatching(g_set)
+        matcher.instance_matching_br()
+        if len(journal.g) == 0 or brs[0].get_is_part_of() != journal:
+            self.fail()
+
     def test_remove_files(self):
         os.system(f'rm "{self.test_dir}matched.rdf"')
         os.system(f'rm "{self.test_dir}provenance.rdf"')